@@ -0,0 +1,104 @@
+"""
+Process-wide asset manager. Every PNG in assets/images is read from disk
+once, packed side by side into a single atlas surface, and handed out as
+shared subsurfaces of it; fonts are loaded once per size. Nothing is loaded
+until first use, which must come after the display mode is set.
+"""
+import os
+import pygame
+
+# absolute path of the assets directory, resolved once per process
+asset_path = os.path.join(os.path.split(os.path.realpath(__file__))[0], "assets")
+
+atlas = None   # one surface holding every image
+images = {}    # file name -> subsurface of the atlas
+scaled = {}    # (file name, size) -> image scaled to size x size
+fonts = {}     # size -> DS-Digital font
+sysfonts = {}  # (name, size) -> system font
+glyphs = {}    # (character, size, color) -> rendered DS-Digital character
+
+
+def load_atlas():
+    """
+    Read every image in assets/images and pack them into the atlas
+    """
+    global atlas
+    image_path = os.path.join(asset_path, "images")
+    loaded = [(name, pygame.image.load(os.path.join(image_path, name)))
+              for name in sorted(os.listdir(image_path)) if name.endswith(".png")]
+    width = sum(image.get_width() for name, image in loaded)
+    height = max(image.get_height() for name, image in loaded)
+    atlas = pygame.Surface((width, height)).convert()
+    x = 0
+    for name, image in loaded:
+        atlas.blit(image, (x, 0))
+        images[name] = atlas.subsurface(pygame.Rect(x, 0, image.get_width(), image.get_height()))
+        x += image.get_width()
+
+
+def image(name):
+    """
+    :param name: file name of an image in assets/images, e.g. "flag_20.png"
+    :return: shared pygame surface for the image
+    """
+    if atlas is None:
+        load_atlas()
+    return images[name]
+
+
+def scaled_image(name, size):
+    """
+    :param name: file name of a square image in assets/images
+    :param size: int, width and height in pixels
+    :return: shared pygame surface of the image scaled to size; the atlas image itself at its own size
+    """
+    original = image(name)
+    if original.get_width() == size:
+        return original
+    key = (name, size)
+    if key not in scaled:
+        # smoothscale only handles 24 and 32-bit surfaces, which the atlas is on any normal display
+        if original.get_bitsize() in (24, 32):
+            scaled[key] = pygame.transform.smoothscale(original, (size, size))
+        else:
+            scaled[key] = pygame.transform.scale(original, (size, size))
+    return scaled[key]
+
+
+def font(size):
+    """
+    :param size: int, point size
+    :return: shared DS-Digital pygame font of that size
+    """
+    if size not in fonts:
+        fonts[size] = pygame.font.Font(os.path.join(asset_path, "fonts", "DS-DIGIB.ttf"), size)
+    return fonts[size]
+
+
+def sysfont(name, size):
+    """
+    :return: shared pygame system font; looking one up walks the system font list, so it's done once
+    """
+    key = (name, size)
+    if key not in sysfonts:
+        sysfonts[key] = pygame.font.SysFont(name, size)
+    return sysfonts[key]
+
+
+def draw_digits(surface, text, pos, size, color):
+    """
+    Draw text in the DS-Digital font from pre-rendered glyphs, one per character
+    :param surface: pygame surface to draw on
+    :param text: str of characters to draw, e.g. "007"
+    :param pos: (x, y) of the top left corner of the text
+    :param size: int, font size
+    :param color: RGB tuple
+    """
+    x, y = pos
+    for character in text:
+        key = (character, size, color)
+        if key not in glyphs:
+            glyphs[key] = font(size).render(character, 1, color)
+        glyph = glyphs[key]
+        surface.blit(glyph, (x, y))
+        x += glyph.get_width()
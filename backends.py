@@ -0,0 +1,8 @@
+"""
+Engine backends by name, so games can be played and benchmarked on any of them.
+Every backend has the Engine API.
+"""
+from engine import Engine
+from bitboard import BitboardEngine
+
+BACKENDS = dict((backend.name, backend) for backend in (Engine, BitboardEngine))
@@ -0,0 +1,156 @@
+import json
+import time
+import argparse
+import multiprocessing
+import instrument
+import record
+import settings
+from engine import MODES, derive_seed, check_mode
+from backends import BACKENDS
+from strategies import STRATEGIES, play
+
+
+def play_games(job):
+    """
+    Play a range of games in one worker process.
+    Game k always gets the seed derive_seed(seed, k), so results don't depend
+    on how the games are split between workers.
+    :param job: (strategy name, rows, cols, mines, mode, seed, first game number, number of games, profile,
+                 record, backend) where record is None, "seed" or "mines" for how games are recorded
+                 and backend is a name in BACKENDS
+    :return: dict of summed stats for the range, plus the exported instrument stats under
+             "profile" when profile is set and the encoded games under "records" when record is set
+    """
+    name, rows, cols, mines, mode, seed, first, count, profile, store, backend = job
+    if profile:
+        instrument.enable()
+    strategy = STRATEGIES[name]()
+    stats = {"games": 0, "wins": 0, "moves": 0, "guesses": 0, "seconds": 0.0}
+    records = []
+    engine = None
+    for k in xrange(first, first + count):
+        # processor time of this worker, so games don't get charged for time other processes ran
+        start = time.clock()
+        if engine is None:
+            engine = BACKENDS[backend](rows, cols, mines, seed=derive_seed(seed, k), mode=mode)
+        else:
+            engine.reset(derive_seed(seed, k))
+        if store:
+            played = []
+            moves, guesses = play(engine, strategy, on_move=lambda move, opened: played.append((move, len(opened))))
+            records.append(record.encode_game(engine, played, store == "mines", name))
+        else:
+            moves, guesses = play(engine, strategy)
+        stats["seconds"] += time.clock() - start
+        stats["games"] += 1
+        stats["wins"] += engine.won
+        stats["moves"] += moves
+        stats["guesses"] += guesses
+    if profile:
+        stats["profile"] = instrument.disable().export()
+    if store:
+        stats["records"] = records
+    return stats
+
+
+def run_batch(strategy, rows, cols, mines, mode, games, seed, workers, chunk, profile=False, writer=None,
+              backend="array"):
+    """
+    Play games with one strategy spread over a pool of worker processes
+    :param profile: collect instrument stats in every worker
+    :param writer: record.RecordWriter that every game is appended to, in game order
+    :param backend: name of the engine backend in BACKENDS
+    :return: dict of summed stats over every game, plus wall-clock "elapsed" and,
+             when profiling, the merged instrument.Stats under "profile"
+    """
+    jobs = [(strategy, rows, cols, mines, mode, seed, first, min(chunk, games - first), profile,
+             None if writer is None else "mines" if writer.store_mines else "seed", backend)
+            for first in xrange(0, games, chunk)]
+    totals = {"games": 0, "wins": 0, "moves": 0, "guesses": 0, "seconds": 0.0}
+    merged = instrument.Stats() if profile else None
+    start = time.time()
+    if workers == 1:
+        results = (play_games(job) for job in jobs)
+    else:
+        pool = multiprocessing.Pool(workers)
+        if writer is None:
+            results = pool.imap_unordered(play_games, jobs)
+        else:
+            # chunks in order, so game k is the k-th record written
+            results = pool.imap(play_games, jobs)
+    for result in results:
+        for key in totals:
+            totals[key] += result[key]
+        if profile:
+            merged.merge(result["profile"])
+        if writer is not None:
+            writer.write_encoded(result["records"])
+    if workers != 1:
+        pool.close()
+        pool.join()
+    totals["elapsed"] = time.time() - start
+    if profile:
+        totals["profile"] = merged
+    return totals
+
+
+def report(strategy, totals):
+    games = totals["games"]
+    print "strategy:     %s" % strategy
+    print "games:        %d" % games
+    print "win rate:     %.2f%% (%d wins)" % (100.0 * totals["wins"] / games, totals["wins"])
+    print "moves/game:   %.1f" % (float(totals["moves"]) / games)
+    print "guesses/game: %.2f" % (float(totals["guesses"]) / games)
+    print "ms/game:      %.3f (cpu time in workers)" % (1000.0 * totals["seconds"] / games)
+    print "games/sec:    %.1f (wall clock %.1fs)" % (games / totals["elapsed"], totals["elapsed"])
+    if "profile" in totals:
+        print
+        print totals["profile"].report()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play many games with the solver, with no display")
+    parser.add_argument("--games", type=int, default=1000, help="number of games to play")
+    parser.add_argument("--difficulty", default="expert", help="easy, intermediate, expert, another preset in settings.yaml or ROWSxCOLSxMINES")
+    parser.add_argument("--mode", default="classic", choices=MODES, help="board generation mode")
+    parser.add_argument("--seed", type=int, default=0, help="base seed; game k uses a seed derived from it")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(),
+                        help="worker processes (default: one per core)")
+    parser.add_argument("--strategy", default="probability",
+                        help="comma-separated strategies to compare on the same boards: %s" % ", ".join(sorted(STRATEGIES)))
+    parser.add_argument("--chunk", type=int, default=100, help="games handed to a worker at a time")
+    parser.add_argument("--profile", action="store_true",
+                        help="time engine operations and solver phases and report them")
+    parser.add_argument("--backend", default="array", choices=sorted(BACKENDS), help="engine backend")
+    parser.add_argument("--record", help="append every game played to this binary record file")
+    parser.add_argument("--record-mines", action="store_true",
+                        help="record each game's mine layout instead of its seed")
+    parser.add_argument("--profile-out", help="also write the profile of each strategy as JSON to this file")
+    args = parser.parse_args()
+
+    try:
+        rows, cols, mines = settings.board_size(args.difficulty)
+        check_mode(rows, cols, mines, args.mode)
+    except ValueError as e:
+        parser.error(str(e))
+    names = args.strategy.split(",")
+    for name in names:
+        if name not in STRATEGIES:
+            parser.error("unknown strategy %r" % name)
+
+    profiles = {}
+    writer = record.RecordWriter(args.record, args.record_mines) if args.record else None
+    for name in names:
+        totals = run_batch(name, rows, cols, mines, args.mode,
+                           max(1, args.games), args.seed, max(1, args.workers), max(1, args.chunk),
+                           args.profile or bool(args.profile_out), writer, args.backend)
+        report(name, totals)
+        if args.profile_out:
+            profiles[name] = totals["profile"].export()
+        print
+
+    if writer is not None:
+        writer.close()
+    if args.profile_out:
+        with open(args.profile_out, "w") as f:
+            json.dump(profiles, f, indent=2, sort_keys=True)
@@ -0,0 +1,289 @@
+"""
+Benchmark harness for the engine primitives and every registered solver
+strategy, over fixed seeded board corpora, on any of the engine backends.
+
+Each case runs in a fresh worker process so its peak memory can be read
+from the process's max RSS. Results are written as JSON and can be compared
+against a previous run to catch speed and win-rate regressions:
+
+    python bench.py --out before.json
+    python bench.py --out after.json --compare before.json
+"""
+import sys
+import json
+import math
+import time
+import platform
+import argparse
+import resource
+import multiprocessing
+from timeit import default_timer as timer
+from engine import derive_seed
+from backends import BACKENDS
+from strategies import STRATEGIES, play
+import settings
+
+# every corpus is built from this seed; change it and results are no longer comparable
+CORPUS_SEED = 20161018
+
+# sizes beyond the presets in settings.yaml, at roughly the same mine density
+CUSTOM_CORPORA = [
+    ("large", 64, 64, 410),
+    ("huge", 256, 256, 6554),
+]
+
+# corpora too big for a quick solver run are only used for the primitives
+PRIMITIVE_ONLY = ("huge",)
+
+
+def corpora(games):
+    """
+    :param games: number of games in the preset-sized corpora
+    :return: list of (name, rows, cols, mines, number of games)
+    """
+    result = []
+    for name in ("easy", "intermediate", "expert"):
+        rows, cols, mines = settings.board_size(name)
+        result.append((name, rows, cols, mines, games))
+    for name, rows, cols, mines in CUSTOM_CORPORA:
+        # keep the bigger corpora to about the same number of cells in total
+        result.append((name, rows, cols, mines, max(10, games * 480 // (rows * cols))))
+    return result
+
+
+def wilson(wins, games, z=1.96):
+    """
+    :return: (low, high) 95% Wilson score interval for a win rate
+    """
+    if games == 0:
+        return 0.0, 0.0
+    p = float(wins) / games
+    denominator = 1 + z * z / games
+    center = (p + z * z / (2 * games)) / denominator
+    spread = z * math.sqrt(p * (1 - p) / games + z * z / (4 * games * games)) / denominator
+    return center - spread, center + spread
+
+
+def peak_memory_kb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def bench_generate(backend, rows, cols, mines, games):
+    engine = backend(rows, cols, mines, seed=CORPUS_SEED)
+    start = timer()
+    for k in xrange(games):
+        engine.reset(derive_seed(CORPUS_SEED, k))
+    elapsed = timer() - start
+    return {"boards_per_sec": games / elapsed, "ns_per_board": 1e9 * elapsed / games}
+
+
+def first_flood(engine):
+    """
+    :return: index of the first empty safe cell on the engine's board, or -1 if there is none
+    """
+    i = engine.neighbors.find(b'\x00')
+    while i >= 0 and engine.is_mine[i]:
+        i = engine.neighbors.find(b'\x00', i + 1)
+    return i
+
+
+def bench_flood(backend, rows, cols, mines, games):
+    engine = backend(rows, cols, mines, seed=CORPUS_SEED)
+    elapsed = 0.0
+    cells = 0
+    floods = 0
+    for k in xrange(games):
+        engine.reset(derive_seed(CORPUS_SEED, k))
+        i = first_flood(engine)
+        if i < 0:
+            continue
+        start = timer()
+        opened = engine.reveal(i)
+        elapsed += timer() - start
+        cells += len(opened)
+        floods += 1
+    return {"ns_per_flood": 1e9 * elapsed / max(1, floods), "ns_per_cell": 1e9 * elapsed / max(1, cells),
+            "cells_per_flood": float(cells) / max(1, floods)}
+
+
+def bench_frontier(backend, rows, cols, mines, games):
+    engine = backend(rows, cols, mines, seed=CORPUS_SEED)
+    elapsed = 0.0
+    calls = 0
+    for k in xrange(games):
+        engine.reset(derive_seed(CORPUS_SEED, k))
+        i = first_flood(engine)
+        if i < 0:
+            continue
+        engine.reveal(i)
+        start = timer()
+        engine.frontier()
+        elapsed += timer() - start
+        calls += 1
+    return {"ns_per_frontier": 1e9 * elapsed / max(1, calls)}
+
+
+def bench_win_check(backend, rows, cols, mines, games):
+    engine = backend(rows, cols, mines, seed=CORPUS_SEED)
+    calls = games * 1000
+    start = timer()
+    for k in xrange(calls):
+        engine.check_win()
+    elapsed = timer() - start
+    return {"ns_per_check": 1e9 * elapsed / calls}
+
+
+def bench_solver(name, backend, rows, cols, mines, games):
+    strategy = STRATEGIES[name]()
+    engine = backend(rows, cols, mines, seed=CORPUS_SEED, mode='safe')
+    wins = moves = guesses = 0
+    start = timer()
+    for k in xrange(games):
+        engine.reset(derive_seed(CORPUS_SEED, k))
+        game_moves, game_guesses = play(engine, strategy)
+        wins += engine.won
+        moves += game_moves
+        guesses += game_guesses
+    elapsed = timer() - start
+    low, high = wilson(wins, games)
+    return {"games": games, "games_per_sec": games / elapsed, "ns_per_move": 1e9 * elapsed / max(1, moves),
+            "win_rate": float(wins) / games, "win_rate_low": low, "win_rate_high": high,
+            "guesses_per_game": float(guesses) / games}
+
+
+PRIMITIVES = {
+    "generate": bench_generate,
+    "flood": bench_flood,
+    "frontier": bench_frontier,
+    "win_check": bench_win_check,
+}
+
+
+# timings compared against the baseline; smaller is better
+TIMES = ("ns_per_board", "ns_per_flood", "ns_per_cell", "ns_per_frontier", "ns_per_check", "ns_per_move")
+RATES = ("boards_per_sec", "games_per_sec")
+
+
+def run_case(case):
+    """
+    Run one benchmark case; called in a fresh worker process.
+    Like timeit, the case is repeated and the best timings are kept, since
+    slower runs only measure interference from the rest of the machine.
+    :param case: (kind, name, rows, cols, mines, games, repeat, backend) where kind is a
+                 primitive or "solver:<strategy>" and backend a name in BACKENDS
+    :return: (case key, dict of results); the key names the backend unless it's the array engine
+    """
+    kind, name, rows, cols, mines, games, repeat, backend = case
+    engine = BACKENDS[backend]
+    result = None
+    for r in xrange(repeat):
+        if kind.startswith("solver:"):
+            run = bench_solver(kind.split(":", 1)[1], engine, rows, cols, mines, games)
+        else:
+            run = PRIMITIVES[kind](engine, rows, cols, mines, games)
+        if result is None:
+            result = run
+        for metric in TIMES:
+            if metric in run:
+                result[metric] = min(result[metric], run[metric])
+        for metric in RATES:
+            if metric in run:
+                result[metric] = max(result[metric], run[metric])
+    result["peak_memory_kb"] = peak_memory_kb()
+    if backend != "array":
+        kind += "@" + backend
+    return "%s/%s" % (kind, name), result
+
+
+def compare(baseline, current, time_tolerance, win_tolerance):
+    """
+    :return: list of regression messages; empty when nothing got worse beyond the tolerances
+    """
+    regressions = []
+    for key, result in sorted(current["results"].iteritems()):
+        before = baseline["results"].get(key)
+        if before is None:
+            continue
+        for metric in TIMES:
+            if metric in result and metric in before and result[metric] > before[metric] * (1 + time_tolerance):
+                regressions.append("%s %s: %.0f -> %.0f (+%.0f%%)" % (
+                    key, metric, before[metric], result[metric], 100.0 * (result[metric] / before[metric] - 1)))
+        if "win_rate" in result and "win_rate" in before:
+            # only flag a drop bigger than the tolerance that the confidence intervals also support
+            if (result["win_rate"] < before["win_rate"] - win_tolerance and
+                    result["win_rate_high"] < before["win_rate_low"]):
+                regressions.append("%s win_rate: %.2f%% -> %.2f%%" % (
+                    key, 100 * before["win_rate"], 100 * result["win_rate"]))
+    return regressions
+
+
+def report(results):
+    for key, result in sorted(results.iteritems()):
+        parts = []
+        for metric, value in sorted(result.iteritems()):
+            if metric == "win_rate":
+                parts.append("win_rate=%.2f%% [%.2f, %.2f]" % (
+                    100 * value, 100 * result["win_rate_low"], 100 * result["win_rate_high"]))
+            elif metric not in ("win_rate_low", "win_rate_high"):
+                parts.append("%s=%s" % (metric, "%.1f" % value if isinstance(value, float) else value))
+        print "%-34s %s" % (key, " ".join(parts))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark engine primitives and solver strategies")
+    parser.add_argument("--games", type=int, default=200, help="games per preset-sized corpus")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each case; the best timings are kept")
+    parser.add_argument("--strategy", default=",".join(sorted(STRATEGIES)),
+                        help="comma-separated strategies to benchmark (default: all)")
+    parser.add_argument("--backend", default="array",
+                        help="comma-separated engine backends to benchmark: %s" % ", ".join(sorted(BACKENDS)))
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to check for regressions")
+    parser.add_argument("--time-tolerance", type=float, default=0.15,
+                        help="allowed slowdown of any timing, as a fraction (default 0.15)")
+    parser.add_argument("--win-tolerance", type=float, default=0.01,
+                        help="allowed drop in win rate, as a fraction (default 0.01)")
+    args = parser.parse_args()
+
+    names = args.strategy.split(",")
+    for name in names:
+        if name not in STRATEGIES:
+            parser.error("unknown strategy %r" % name)
+    backends = args.backend.split(",")
+    for backend in backends:
+        if backend not in BACKENDS:
+            parser.error("unknown backend %r" % backend)
+
+    repeat = max(1, args.repeat)
+    cases = []
+    for corpus, rows, cols, mines, games in corpora(max(1, args.games)):
+        for backend in backends:
+            for kind in sorted(PRIMITIVES):
+                cases.append((kind, corpus, rows, cols, mines, games, repeat, backend))
+            if corpus not in PRIMITIVE_ONLY:
+                for name in names:
+                    cases.append(("solver:" + name, corpus, rows, cols, mines, games, repeat, backend))
+
+    # one fresh process per case so peak memory belongs to that case alone
+    pool = multiprocessing.Pool(1, maxtasksperchild=1)
+    results = dict(pool.imap(run_case, cases))
+    pool.close()
+    pool.join()
+
+    current = {"python": platform.python_version(), "time": time.time(),
+               "games": args.games, "repeat": repeat, "corpus_seed": CORPUS_SEED, "results": results}
+    report(results)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, current, args.time_tolerance, args.win_tolerance)
+        for message in regressions:
+            print "REGRESSION", message
+        if regressions:
+            sys.exit(1)
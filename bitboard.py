@@ -0,0 +1,281 @@
+"""
+Engine backend that keeps the mine, revealed and flagged layers as bitmasks
+in Python ints, bit i standing for flat index i (row-major). Whole-board
+queries become a few shift-and-mask operations on those ints, which run in
+C no matter how many cells they touch:
+
+    dilate   - a mask grown by one cell in all 8 directions, with the
+               column masks stopping it from wrapping around row ends
+    flood    - reveal grows the opened region by dilating its newly opened
+               empty cells until nothing new is added
+    counts   - neighbor counts are the 8 shifted mine masks summed with a
+               bit-sliced adder into 4 bit planes, then unpacked to bytes
+    frontier - hidden, unflagged cells in the dilation of the revealed safe cells
+
+BitboardEngine has the same API as Engine. Its is_mine, revealed and
+flagged are BitLayers that index like the bytearrays, so renderers and
+strategies use either backend unchanged; neighbors is still a bytearray,
+since every revealed number is read from it. Single-cell access costs a
+shift of the whole mask, so this backend suits boards up to some thousands
+of cells, and work done cell by cell, like a solver's, runs no faster
+than on the array engine; numpy is not needed.
+"""
+import string
+from engine import Engine
+import instrument
+
+# '0'-'8' -> the byte values 0-8, for unpacking counts from hex digits
+HEX_TO_BYTE = string.maketrans('012345678', ''.join(chr(n) for n in xrange(9)))
+
+# (rows, cols) -> (all cells, all but the first column, all but the last column)
+geometries = {}
+
+
+def geometry(rows, cols):
+    """
+    :return: (full, not_first_col, not_last_col) masks for a board size, cached per size
+    """
+    key = (rows, cols)
+    if key not in geometries:
+        full = (1 << rows * cols) - 1
+        # the lowest bit of every row
+        first_col = int(('0' * (cols - 1) + '1') * rows, 2)
+        geometries[key] = (full, full ^ first_col, full ^ (first_col << cols - 1))
+    return geometries[key]
+
+
+def bit_indices(mask):
+    """
+    :return: sorted list of the indices of the set bits in mask
+    """
+    bits = format(mask, 'b')[::-1]
+    indices = []
+    i = bits.find('1')
+    while i >= 0:
+        indices.append(i)
+        i = bits.find('1', i + 1)
+    return indices
+
+
+def mask_of(indices, size):
+    """
+    :return: int with the bits at indices set; built as a string, so it's linear in size
+    """
+    bits = bytearray(b'0' * size)
+    for i in indices:
+        bits[size - 1 - i] = '1'
+    return int(str(bits), 2) if size else 0
+
+
+class BitLayer(object):
+    """
+    Bytearray-like view of one of a BitboardEngine's masks: layer[i] reads
+    and writes bit i, and iterating yields every cell's bit
+    """
+    __slots__ = ('engine', 'name')
+
+    def __init__(self, engine, name):
+        self.engine = engine
+        self.name = name
+
+    def __getitem__(self, i):
+        return getattr(self.engine, self.name) >> i & 1
+
+    def __setitem__(self, i, value):
+        mask = getattr(self.engine, self.name)
+        setattr(self.engine, self.name, mask | 1 << i if value else mask & ~(1 << i))
+
+    def __len__(self):
+        return self.engine.size
+
+    def __iter__(self):
+        bits = format(getattr(self.engine, self.name), '0%db' % self.engine.size)[::-1]
+        return (ord(bit) - 48 for bit in bits)
+
+
+class BitboardEngine(Engine):
+    """
+    Engine whose cell layers are bitmasks; see the module docstring
+    """
+    name = 'bitboard'
+
+    def __init__(self, rows, cols, mines, seed=None, mode='classic', track_changes=False):
+        self.full, self.not_first_col, self.not_last_col = geometry(rows, cols)
+        self.is_mine = BitLayer(self, 'mine_mask')
+        self.revealed = BitLayer(self, 'revealed_mask')
+        self.flagged = BitLayer(self, 'flagged_mask')
+        Engine.__init__(self, rows, cols, mines, seed, mode, track_changes)
+
+
+    def allocate(self):
+        self.mine_mask = 0
+        self.revealed_mask = 0
+        self.flagged_mask = 0
+        self.zero_mask = self.full  # safe cells with no neighboring mines
+        self.neighbors = bytearray(self.size)
+
+
+    def dilate(self, mask):
+        """
+        :return: mask grown by one cell in every direction, clipped at the board edges
+        """
+        row = mask | (mask << 1 & self.not_first_col) | (mask >> 1 & self.not_last_col)
+        return (row | row << self.cols | row >> self.cols) & self.full
+
+
+    def clear_mines(self):
+        self.mine_mask = 0
+        self.zero_mask = self.full
+        self.neighbors[:] = bytearray(self.size)
+        del self.mine_locations[:]
+        self.placed = False
+
+
+    def set_mines(self, indices):
+        indices = list(indices)
+        self.mine_mask = mask_of(indices, self.size)
+        self.mine_locations.extend(self.position(i) for i in indices)
+        self.count_neighbors()
+        self.finish_placing()
+
+
+    def count_neighbors(self):
+        """
+        Sum the mine mask shifted onto each cell from its 8 neighbors with a
+        bit-sliced adder: plane k holds bit k of every cell's count. The
+        planes are unpacked by reading each one's binary digits as hex, which
+        spreads its bits one per nibble, so adding the scaled planes leaves
+        each cell's count in its own hex digit.
+        """
+        mines = self.mine_mask
+        full = self.full
+        cols = self.cols
+        west = mines << 1 & self.not_first_col
+        east = mines >> 1 & self.not_last_col
+        shifted = (west, east, mines << cols & full, mines >> cols,
+                   west << cols & full, east << cols & full, west >> cols, east >> cols)
+        planes = [0, 0, 0, 0]
+        for mask in shifted:
+            carry = mask
+            for k in xrange(4):
+                planes[k], carry = planes[k] ^ carry, planes[k] & carry
+                if not carry:
+                    break
+        self.zero_mask = full & ~(planes[0] | planes[1] | planes[2] | planes[3]) & ~mines
+
+        size = self.size
+        total = 0
+        for k, plane in enumerate(planes):
+            total += int(format(plane, '0%db' % size), 16) << k
+        self.neighbors[:] = bytearray(format(total, '0%dx' % size)[::-1].translate(HEX_TO_BYTE))
+
+
+    def move_mine(self, src, dst):
+        """
+        Move the mine at index src to the empty cell dst, updating only the
+        neighbor counts and empty-cell bits around the two cells
+        """
+        neighbors = self.neighbors
+        mines = self.mine_mask = self.mine_mask & ~(1 << src) | 1 << dst
+        changed = [src, dst]
+        for n in self.get_neighbors(src):
+            neighbors[n] -= 1
+            changed.append(n)
+        for n in self.get_neighbors(dst):
+            neighbors[n] += 1
+            changed.append(n)
+        zero = self.zero_mask
+        for n in changed:
+            if neighbors[n] == 0 and not mines >> n & 1:
+                zero |= 1 << n
+            else:
+                zero &= ~(1 << n)
+        self.zero_mask = zero
+        self.mine_locations.remove(self.position(src))
+        self.mine_locations.append(self.position(dst))
+        self.move_flag_counts(src, dst)
+
+
+    def frontier(self):
+        safe = self.revealed_mask & ~self.mine_mask
+        return bit_indices(self.dilate(safe) & ~self.revealed_mask & ~self.flagged_mask)
+
+
+    def reveal_neighbors(self, i):
+        """
+        Reveal cell i and flood outward through empty cells
+        """
+        return bit_indices(self.flood(1 << i))
+
+
+    def flood(self, seeds):
+        """
+        Reveal the safe cells in seeds and flood outward through empty cells,
+        growing the region by dilating only the empty cells added in the previous step
+        :return: mask of the newly revealed cells
+        """
+        opened = seeds
+        closed = self.revealed_mask | self.flagged_mask | opened
+        edge = opened
+        while edge:
+            edge = self.dilate(edge & self.zero_mask) & ~closed
+            closed |= edge
+            opened |= edge
+        self.revealed_mask |= opened
+        return opened
+
+
+    @instrument.timed('engine.chord')
+    def chord(self, i):
+        """
+        Engine.chord with masks: the flags are counted and the hidden
+        neighbors flooded from all at once, instead of cell by cell
+        """
+        bit = 1 << i
+        if not self.revealed_mask & bit or self.mine_mask & bit:
+            return []
+        around = self.dilate(bit) & ~bit
+        if bin(around & self.flagged_mask).count('1') != self.neighbors[i]:
+            return []
+        hidden = around & ~self.revealed_mask & ~self.flagged_mask
+        if hidden & self.mine_mask:
+            # the first one in neighbor order, as Engine.chord finds it
+            return self.detonate(bit_indices(hidden & self.mine_mask)[0])
+        opened = bit_indices(self.flood(hidden)) if hidden else []
+        self.count_opened(opened)
+        return opened
+
+
+    def reveal_all(self):
+        self.revealed_mask = self.full
+        self.redraw_all = True
+
+
+    def snapshot(self):
+        # the masks are immutable ints, so only the neighbor counts need copying
+        return (self.mine_mask, self.revealed_mask, self.flagged_mask, self.zero_mask,
+                bytearray(self.neighbors), list(self.mine_locations), self.detonated, self.score,
+                self.lost, self.won, self.hidden_safe, self.correct_flags, self.wrong_flags, self.placed,
+                self.seed, self.rng.getstate())
+
+
+    def restore(self, state):
+        self.mine_mask, self.revealed_mask, self.flagged_mask, self.zero_mask, neighbors, mine_locations, \
+            self.detonated, self.score, self.lost, self.won, self.hidden_safe, self.correct_flags, \
+            self.wrong_flags, self.placed, self.seed, rng_state = state
+        self.rng.setstate(rng_state)
+        self.neighbors[:] = neighbors
+        self.mine_locations[:] = mine_locations
+        self.redraw_all = True
+        if self.changed is not None:
+            del self.changed[:]
+
+
+    def grid(self, layer):
+        """
+        :return: (rows, cols) uint8 numpy array of the layer; a copy for the
+                 mask layers, so writing to it doesn't change the engine
+        """
+        if isinstance(layer, BitLayer):
+            layer = bytearray(layer)
+        return Engine.grid(self, layer)
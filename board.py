@@ -1,105 +1,198 @@
 import os
-import random
 import pygame
 from pygame.locals import *  # for keypress constants
 from cell import Cell
+from engine import Engine
+import instrument
+
+CELL_SIZE = 24       # pixels per side of a cell at full size
+MIN_CELL_SIZE = 6    # smallest cells a board is shrunk to so it fits on the display
+BOARD_PADDING = 5    # pixels between the cells and the window edges
+HEADER_HEIGHT = 36   # pixels for the score, timer and buttons above the cells
+MIN_WIDTH = 200      # narrowest window the header fits in
+
+
+def window_size(rows, cols, cell_size=CELL_SIZE, header_height=HEADER_HEIGHT):
+    """
+    :return: (width, height) in pixels of the window for a board
+    """
+    return (max(MIN_WIDTH, cols * cell_size + 2 * BOARD_PADDING),
+            rows * cell_size + 2 * BOARD_PADDING + header_height)
+
+
+def fit_cell_size(rows, cols, max_width, max_height, header_height=HEADER_HEIGHT):
+    """
+    :return: largest cell size up to CELL_SIZE whose window fits in max_width x max_height,
+             but never below MIN_CELL_SIZE
+    """
+    fits = min((max_width - 2 * BOARD_PADDING) // cols,
+               (max_height - 2 * BOARD_PADDING - header_height) // rows)
+    return max(MIN_CELL_SIZE, min(CELL_SIZE, fits))
+
+
+def display_cell_size(rows, cols, header_height=HEADER_HEIGHT):
+    """
+    Cell size that fits the board's window on the desktop, leaving room for
+    window decorations. Call after pygame.init() and before the first
+    display.set_mode(); afterwards display.Info() describes the window
+    instead of the desktop, so the full CELL_SIZE is used.
+    """
+    info = pygame.display.Info()
+    if pygame.display.get_surface() is not None or info.current_w <= 0 or info.current_h <= 0:
+        return CELL_SIZE
+    return fit_cell_size(rows, cols, info.current_w - 40, info.current_h - 80, header_height)
+
 
 class Board(object):
-    def __init__(self, width, height, rows, cols, mines, screen, header_height):   
+    def __init__(self, rows, cols, mines, screen, header_height=HEADER_HEIGHT, mode='classic', cell_size=CELL_SIZE):
         """
-        Create game board and populate with mines.        
+        Create game board and populate with mines.
+        The board is the drawable view of an Engine; without a screen it is
+        never drawn, which is how headless games are played.
+        The window size follows from the board and cell size; see window_size().
         """
         self.header_height = header_height
         self.screen = screen      
-        self.width = width
-        self.height = height
+        self.width, self.height = window_size(rows, cols, cell_size, header_height)
         self.rows = rows
         self.cols = cols
         self.mines = mines
-        self.mine_locations = []
         self.cell_margin = 0
-        self.cell_size = 24
-        self.board_padding = 5
+        self.cell_size = cell_size
+        self.board_padding = BOARD_PADDING
 
-        # board object
-        self.cells = [[None for i in xrange(self.cols)] for i in xrange(self.rows)]
+        # game state lives in the engine; cells are views that know how to draw it
+        self.engine = Engine(rows, cols, mines, mode=mode, track_changes=screen is not None)
 
-        # add unrevealed cells and hidden mines to board
-        self.reset()
+        # board object; cells[i][j] builds a Cell view on demand
+        self.cells = CellGrid(self)
 
 
-    def reset(self):
+    def reset(self, seed=None):
         """
         Reset tiles and spawn mines at new locations
+        :param seed: optional int seed to reproduce a specific layout
+        """
+        self.engine.reset(seed)
+
+
+    @property
+    def mine_locations(self):
+        return self.engine.mine_locations
+
+
+    def cell_rect(self, row, col):
+        """
+        :return: pygame Rect of the cell at (row, col) in screen coordinates
+        """
+        ypos = self.board_padding + (self.cell_size * row) + (self.cell_margin * row) + self.header_height
+        xpos = self.board_padding + (self.cell_size * col) + (self.cell_margin * col)
+        return Rect(xpos, ypos, self.cell_size, self.cell_size)
+
+
+    def cell_at(self, x, y):
+        """
+        Map a screen position straight to the cell under it, for clicks, hover and drags
+        :return: (row, col) tuple, or None if (x, y) isn't over a cell
         """
+        pitch = self.cell_size + self.cell_margin
+        row, row_offset = divmod(y - self.board_padding - self.header_height, pitch)
+        col, col_offset = divmod(x - self.board_padding, pitch)
+        if (0 <= row < self.rows and 0 <= col < self.cols and
+                row_offset < self.cell_size and col_offset < self.cell_size):
+            return row, col
+        return None
 
-        # set cells up on board
-        for i in xrange(self.rows):
-            for j in xrange(self.cols):
-                cell = Cell(i, j, self.screen)
-                # cell.revealed = True
-                ypos = self.board_padding + (self.cell_size * i) + (self.cell_margin * i) + self.header_height
-                xpos = self.board_padding + (self.cell_size * j) + (self.cell_margin * j)
-                rect = Rect(xpos, ypos, self.cell_size, self.cell_size)
-                cell.rect = rect
-                self.cells[i][j] = cell
-
-        # remove previous mine locations
-        del self.mine_locations[:]
-
-        # add new random mines
-        for m in xrange(self.mines):            
-            rand_row = random.randint(0, self.rows-1)
-            rand_col = random.randint(0, self.cols-1)
-            random_mine = (rand_row, rand_col)            
-            if random_mine not in self.mine_locations:                
-                random_mine = (rand_row, rand_col)            
-                self.cells[rand_row][rand_col].is_mine = True
-                self.mine_locations.append(random_mine)
-
-        # reset cell state and calculate new neighbor values for each cell
-        for i in xrange(self.rows):
-            for j in xrange(self.cols):
-                cell = self.cells[i][j]
-                neighbors = self.get_neighbor_cells(i, j)
-                for n in neighbors:
-                    if n.is_mine: cell.neighbors += 1
+
+    def cells_in_rect(self, rect):
+        """
+        :param rect: pygame Rect in screen coordinates, e.g. a drag selection
+        :return: list of (row, col) tuples of the cells overlapping rect
+        """
+        pitch = self.cell_size + self.cell_margin
+        top = self.board_padding + self.header_height
+        first_row = max(0, (rect.top - top) // pitch)
+        last_row = min(self.rows - 1, (rect.bottom - 1 - top) // pitch)
+        first_col = max(0, (rect.left - self.board_padding) // pitch)
+        last_col = min(self.cols - 1, (rect.right - 1 - self.board_padding) // pitch)
+        return [(i, j)
+                for i in xrange(first_row, last_row + 1)
+                for j in xrange(first_col, last_col + 1)]
 
 
+    @instrument.timed('render.board')
     def draw(self):
         """
-        Draw all cells on the board
+        Draw the cells whose state changed since the last draw, or every cell
+        after a reset or game over. The screen keeps what was drawn before, so
+        unchanged cells are never redrawn.
+        :return: list of screen rects that were drawn over
         """
-        for i in xrange(self.rows):
-            for j in xrange(self.cols):
-                # draw the cell
-                self.cells[i][j].draw()
+        engine = self.engine
+        if engine.redraw_all:
+            engine.redraw_all = False
+            del engine.changed[:]
+            for i in xrange(self.rows):
+                for j in xrange(self.cols):
+                    # draw the cell
+                    self.cells[i][j].draw()
+            return [Rect(0, self.header_height, self.width, self.height - self.header_height)]
+
+        rects = []
+        for index in set(engine.changed):
+            cell = Cell(self, index // self.cols, index % self.cols)
+            cell.draw()
+            rects.append(cell.rect)
+        del engine.changed[:]
+        return rects
 
 
     def get_neighbor_cells(self, row, col):
-        """        
+        """
         :return: list of cell objects surrounding cell at (row, col) position
         """
-        neighbors = []        
-        # calculate rows and columns values for each neighboring cell
-        neighbor_offsets = range(-1,2,1)
-        for ni in neighbor_offsets:
-            for nj in neighbor_offsets:
-                # do not count this (center) cell
-                if not ((ni == 0) and (nj == 0)):
-                    # do not wrap around the board with pythons -1 indices:
-                    if (row + ni < 0) or (row + ni > self.rows) or (col + nj < 0) or (col + nj > self.cols):
-                        pass
-                    else:
-                        try:
-                            # try to add the neighbor to the list
-                            cell = self.cells[row+ni][col+nj]
-                            neighbors.append(cell)
-                        except IndexError:
-                            # but if there are no neighbors on this side of the cell, continue
-                            # like if we are on the edge of the board
-                            pass
-        return neighbors
-
-       
+        cols = self.cols
+        return [self.cells[n // cols][n % cols]
+                for n in self.engine.get_neighbors(self.engine.index(row, col))]
+
+
+class CellGrid(object):
+    """
+    Read-only 2-D view of the board: grid[i][j] returns a Cell for (i, j).
+    Cells are created when accessed, so the board never holds one object per cell.
+    """
+    def __init__(self, board):
+        self.board = board
+
+    def __len__(self):
+        return self.board.rows
+
+    def __getitem__(self, row):
+        if not 0 <= row < self.board.rows:
+            raise IndexError(row)
+        return CellRow(self.board, row)
+
+    def __iter__(self):
+        for i in xrange(self.board.rows):
+            yield CellRow(self.board, i)
+
+
+class CellRow(object):
+    """
+    One row of a CellGrid
+    """
+    def __init__(self, board, row):
+        self.board = board
+        self.row = row
+
+    def __len__(self):
+        return self.board.cols
+
+    def __getitem__(self, col):
+        if not 0 <= col < self.board.cols:
+            raise IndexError(col)
+        return Cell(self.board, self.row, col)
 
+    def __iter__(self):
+        for j in xrange(self.board.cols):
+            yield Cell(self.board, self.row, j)
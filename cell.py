@@ -1,32 +1,89 @@
 import pygame
 from colors import *  # for color constants
-import os
+import assets
 
 
-class Cell:
+# font color is based on neighbor count
+number_colors = {1: blue, 2: green, 3: red, 4: purple}
+
+# pre-composited revealed cells, keyed by (neighbor count, cell size)
+revealed_tiles = {}
+
+
+def revealed_tile(neighbors, size):
     """
-    Cell class is used to track the cells' state, drawing info, and number of neighbors
+    Revealed cell background with its neighbor count, rendered on first use
+    :param neighbors: int, 0-8 neighboring mines
+    :param size: int, cell width and height in pixels
+    :return: shared pygame surface
     """
-    def __init__(self, row, col, screen):
-        self.revealed = False
-        self.is_mine = False
-        self.detonated = False
-        self.flagged = False # flagged = user thinks a bomb is here
-        self.rect = None  # used by pygame for click collisions
-        self.neighbors = 0
+    key = (neighbors, size)
+    if key not in revealed_tiles:
+        tile = pygame.Surface((size, size)).convert()
+        # all revealed cells get a solid bg rect and dark borders;
+        # borders go on the top and left edges so neighboring tiles share one line
+        tile.fill((170,170,170))
+        pygame.draw.line(tile, bg_gray_dark, (0, 0), (size - 1, 0), 1)
+        pygame.draw.line(tile, bg_gray_dark, (0, 0), (0, size - 1), 1)
+
+        # show the neighbor count if there is one; the font and inset scale with the cell
+        if neighbors > 0:
+            text_inset = 5 * size // 24
+            label = assets.sysfont('Arial Bold', size).render("%d" % neighbors, 1, number_colors.get(neighbors, black))
+            tile.blit(label, (text_inset, text_inset))
+        revealed_tiles[key] = tile
+    return revealed_tiles[key]
+
+
+class Cell(object):
+    """
+    Cell class is a lightweight view over one engine cell: it reads its state
+    (revealed, mine, flag, neighbor count) from the board's engine and
+    knows how to draw it. Views are created on demand by CellGrid.
+    """
+    __slots__ = ('board', 'row', 'col', 'index')
+
+    inset = 3
+
+    def __init__(self, board, row, col):
+        self.board = board
         self.row = row
         self.col = col
-        self.flag_icon = None
-        self.mine_icon = None
-        self.screen = screen
-        (self.filepath, filename) = os.path.split(os.path.realpath(__file__))
-        self.inset = 3
+        self.index = row * board.cols + col
+
+    @property
+    def engine(self):
+        return self.board.engine
+
+    @property
+    def screen(self):
+        return self.board.screen
+
+    @property
+    def rect(self):
+        # used by pygame for click collisions
+        return self.board.cell_rect(self.row, self.col)
+
+    @property
+    def revealed(self):
+        return bool(self.board.engine.revealed[self.index])
+
+    @property
+    def is_mine(self):
+        return bool(self.board.engine.is_mine[self.index])
 
-    def reset(self):
-        self.revealed = False
-        self.is_mine = False
-        self.detonated = False
-        self.flagged = False
+    @property
+    def detonated(self):
+        return self.board.engine.detonated == self.index
+
+    @property
+    def flagged(self):
+        # flagged = user thinks a bomb is here
+        return bool(self.board.engine.flagged[self.index])
+
+    @property
+    def neighbors(self):
+        return self.board.engine.neighbors[self.index]
 
 
     def draw(self):
@@ -59,113 +116,57 @@ class Cell:
 
 
     def draw_detonated_mine(self):
-        pygame.draw.rect(self.screen, (255,0,0), self.rect, 0)
-        icon = pygame.sprite.Sprite() # create sprite
-        icon_path = os.path.join(self.filepath, "assets/images/mine_red_20.png")
-        icon.image = pygame.image.load(icon_path).convert() # load flagimage
-        # place icon in center of cell        
-        icon.rect = icon.image.get_rect() # use image extent values
-        icon.rect.topleft = [self.rect.x + self.inset, self.rect.y + self.inset] # put the sprite in the top left corner
-        self.screen.blit(icon.image, icon.rect)
+        rect = self.rect
+        pygame.draw.rect(self.screen, (255,0,0), rect, 0)
+        self.draw_icon("mine_red_20.png", rect)
+
 
+    def draw_icon(self, name, rect):
+        # place icon in the top left corner of the cell, inset so it's centered;
+        # the 20px icons fit 24px cells and are scaled for other sizes
+        inset = self.inset * rect.width // 24
+        self.screen.blit(assets.scaled_image(name, rect.width * 20 // 24), (rect.x + inset, rect.y + inset))
 
 
     def draw_flag(self):
         # if flagged by user, draw flag sprite
-        # cache flag sprite on first creation
-        if self.flag_icon == None:
-            self.flag_icon = pygame.sprite.Sprite() # create sprite
-            icon_path = os.path.join(self.filepath, "assets/images/flag_20.png")
-            self.flag_icon.image = pygame.image.load(icon_path).convert() # load flagimage
-        # place flag in center of cell
-        self.flag_icon.rect = self.flag_icon.image.get_rect() # use image extent values
-        self.flag_icon.rect.topleft = [self.rect.x + self.inset, self.rect.y + self.inset] # put the ball in the top left corner
-        self.screen.blit(self.flag_icon.image, self.flag_icon.rect)
+        self.draw_icon("flag_20.png", self.rect)
 
 
     def draw_unrevealed_cell(self):
+        rect = self.rect
         # if not revealed, cell is gray with highlight and shadow
-        pygame.draw.rect(self.screen, bg_gray, self.rect, 0)
+        pygame.draw.rect(self.screen, bg_gray, rect, 0)
         line_width = 2
         # horizontal bottom shadow
         pygame.draw.line(self.screen, bg_gray_dark,
-                         (self.rect.x, self.rect.y + self.rect.height - line_width/2),
-                         (self.rect.x + self.rect.width, self.rect.y + self.rect.height - line_width/2), line_width)
+                         (rect.x, rect.y + rect.height - line_width/2),
+                         (rect.x + rect.width, rect.y + rect.height - line_width/2), line_width)
         # vertical right shadow
         pygame.draw.line(self.screen, bg_gray_dark,
-                         (self.rect.x + self.rect.width - line_width/2, self.rect.y),
-                         (self.rect.x + self.rect.width - line_width/2, self.rect.y + self.rect.height), line_width)
+                         (rect.x + rect.width - line_width/2, rect.y),
+                         (rect.x + rect.width - line_width/2, rect.y + rect.height), line_width)
         # horizontal top highlight
         pygame.draw.line(self.screen, white,
-                         (self.rect.x, self.rect.y + line_width/2 - 1),
-                         (self.rect.x + self.rect.width - line_width, self.rect.y + line_width/2 - 1), line_width)
+                         (rect.x, rect.y + line_width/2 - 1),
+                         (rect.x + rect.width - line_width, rect.y + line_width/2 - 1), line_width)
         # vertical left highlight
         pygame.draw.line(self.screen, white,
-                         (self.rect.x + line_width/2 - 1, self.rect.y),
-                         (self.rect.x + line_width/2 - 1, self.rect.y + self.rect.height - line_width), line_width)
+                         (rect.x + line_width/2 - 1, rect.y),
+                         (rect.x + line_width/2 - 1, rect.y + rect.height - line_width), line_width)
 
 
     def draw_mine(self):
-        if self.mine_icon == None:
-            self.mine_icon = pygame.sprite.Sprite() # create sprite
-            icon_path = os.path.join(self.filepath, "assets/images/mine_20.png")
-            self.mine_icon.image = pygame.image.load(icon_path).convert() # load flagimage
-        # place icon in center of cell
-        self.mine_icon.rect = self.mine_icon.image.get_rect() # use image extent values
-        self.mine_icon.rect.topleft = [self.rect.x + self.inset, self.rect.y + self.inset] # put the sprite in the top left corner
-        self.screen.blit(self.mine_icon.image, self.mine_icon.rect)
+        self.draw_icon("mine_20.png", self.rect)
 
 
     def draw_mine_error(self):
-        icon = pygame.sprite.Sprite() # create sprite
-        icon_path = os.path.join(self.filepath, "assets/images/mine_x_20.png")
-        icon.image = pygame.image.load(icon_path).convert() # load flagimage
-        # place icon in center of cell
-        icon.rect = icon.image.get_rect() # use image extent values
-        icon.rect.topleft = [self.rect.x + self.inset, self.rect.y + self.inset] # put the sprite in the top left corner
-        self.screen.blit(icon.image, icon.rect)
+        self.draw_icon("mine_x_20.png", self.rect)
 
 
     def draw_revealed_cell(self):
-        # all revealed cells get a solid bg rect and dark borders
-        pygame.draw.rect(self.screen, (170,170,170), self.rect, 0)
-
-        line_width = 1
-        # horizontal bottom shadow
-        pygame.draw.line(self.screen, bg_gray_dark,
-                         (self.rect.x, self.rect.y + self.rect.height - line_width/2),
-                         (self.rect.x + self.rect.width, self.rect.y + self.rect.height - line_width/2), line_width)
-        # vertical right shadow
-        pygame.draw.line(self.screen, bg_gray_dark,
-                         (self.rect.x + self.rect.width - line_width/2, self.rect.y),
-                         (self.rect.x + self.rect.width - line_width/2, self.rect.y + self.rect.height), line_width)
-        # horizontal top highlight
-        pygame.draw.line(self.screen, bg_gray_dark,
-                         (self.rect.x, self.rect.y + line_width/2 - 1),
-                         (self.rect.x + self.rect.width - line_width, self.rect.y + line_width/2 - 1), line_width)
-        # vertical left highlight
-        pygame.draw.line(self.screen, bg_gray_dark,
-                         (self.rect.x + line_width/2 - 1, self.rect.y),
-                         (self.rect.x + line_width/2 - 1, self.rect.y + self.rect.height - line_width), line_width)
-
-        # if the cell isn't flagged, is revealed and has neighbors, show the neighbor count
-        if (self.is_mine == False) and (self.revealed == True) and (self.neighbors > 0) and not self.flagged:
-            # font color is based on neighbor count
-            font_color = black
-            if self.neighbors == 1:
-                font_color = blue
-            if self.neighbors == 2:
-                font_color = green
-            if self.neighbors == 3:
-                font_color = red
-            if self.neighbors == 4:
-                font_color = purple
-            font_size = 24
-            text_inset = 5
-            label_text = "%d" % (self.neighbors)
-            label_font = pygame.font.SysFont('Arial Bold', font_size)
-            label = label_font.render(label_text, 1, font_color)
-            self.screen.blit(label, (self.rect.x + text_inset, self.rect.y + text_inset))
+        rect = self.rect
+        self.screen.blit(revealed_tile(self.neighbors, rect.width), rect)
 
 
     def __str__(self):
@@ -0,0 +1,315 @@
+from collections import deque
+import instrument
+
+# what is known about each cell
+UNKNOWN = 0
+SAFE = 1      # deduced safe but not revealed yet
+MINE = 2      # deduced or flagged mine
+REVEALED = 3
+
+
+class Deducer(object):
+    """
+    Logic-only deduction over the revealed numbers of a board.
+
+    Every revealed cell is a constraint: its unknown neighbors hold exactly
+    (number - known neighboring mines) mines. Constraints sit on a worklist
+    and are only re-examined when a cell around them changes, so each new
+    reveal costs work proportional to the area it touches, not the board.
+
+    Rules applied to each constraint A:
+    single  - 0 mines left: all unknowns safe; as many mines as unknowns: all mines
+    pairwise - for an overlapping constraint B, if B needs as many mines
+               outside A as it has cells outside A, those cells are mines and
+               A's cells outside B are safe (this covers the subset rule)
+    and, once the worklist is empty, the global mine count rule.
+    """
+    def __init__(self, table, mines=None):
+        """
+        :param table: (offsets, adjacency) neighbor table of the board, from engine.neighbor_table
+        :param mines: int, total mines on the board, or None to skip the global rule
+        """
+        self.offsets, self.adjacency = table
+        size = len(self.offsets) - 1
+        self.size = size
+        self.mines = mines
+        self.state = bytearray(size)
+        self.numbers = {}  # revealed index -> neighboring mine count shown
+        self.known_mines = 0
+        self.unknown = size
+        self.queue = deque()
+        self.queued = set()
+        self.safe = []  # deductions not yet handed out by run()
+        self.found_mines = []
+
+
+    def reveal(self, i, number):
+        """
+        Record that cell i was revealed showing number
+        """
+        if self.state[i] == UNKNOWN:
+            self.unknown -= 1
+        self.state[i] = REVEALED
+        self.numbers[i] = number
+        self.touch(i)
+
+
+    def mark_mine(self, i):
+        """
+        Record that cell i is known to be a mine, e.g. because it was flagged
+        """
+        if self.state[i] == UNKNOWN:
+            self.set_state(i, MINE)
+
+
+    def neighbors(self, i):
+        return self.adjacency[self.offsets[i]:self.offsets[i + 1]]
+
+
+    def touch(self, i):
+        """
+        Queue cell i and every revealed cell around it for re-examination
+        """
+        # enqueue() inlined; this runs for every reveal and deduction
+        state = self.state
+        queued = self.queued
+        queue = self.queue
+        if state[i] == REVEALED and i not in queued:
+            queued.add(i)
+            queue.append(i)
+        for n in self.adjacency[self.offsets[i]:self.offsets[i + 1]]:
+            if state[n] == REVEALED and n not in queued:
+                queued.add(n)
+                queue.append(n)
+
+
+    def enqueue(self, i):
+        if self.state[i] == REVEALED and i not in self.queued:
+            self.queued.add(i)
+            self.queue.append(i)
+
+
+    def set_state(self, i, state):
+        self.state[i] = state
+        self.unknown -= 1
+        if state == MINE:
+            self.known_mines += 1
+            self.found_mines.append(i)
+        else:
+            self.safe.append(i)
+        self.touch(i)
+
+
+    def constraint(self, i):
+        """
+        :return: (set of unknown neighbor indices, number of mines among them)
+        """
+        states = self.state
+        unknown = set()
+        remaining = self.numbers[i]
+        for n in self.adjacency[self.offsets[i]:self.offsets[i + 1]]:
+            state = states[n]
+            if state == UNKNOWN:
+                unknown.add(n)
+            elif state == MINE:
+                remaining -= 1
+        return unknown, remaining
+
+
+    @instrument.timed('solver.deduction')
+    def run(self):
+        """
+        Work through the queued constraints until nothing more can be deduced
+        :return: (list of newly deduced safe indices, list of newly deduced mine indices)
+        """
+        while True:
+            while self.queue:
+                i = self.queue.popleft()
+                self.queued.discard(i)
+                self.examine(i)
+            if not self.apply_mine_count():
+                break
+        safe, mines = self.safe, self.found_mines
+        self.safe, self.found_mines = [], []
+        return safe, mines
+
+
+    def examine(self, i):
+        unknown, remaining = self.constraint(i)
+        if not unknown:
+            return
+        if remaining == 0:
+            for u in unknown:
+                self.set_state(u, SAFE)
+            return
+        if remaining == len(unknown):
+            for u in unknown:
+                self.set_state(u, MINE)
+            return
+
+        # pairwise: compare with every revealed cell sharing an unknown with this one
+        others = set()
+        for u in unknown:
+            for n in self.neighbors(u):
+                if self.state[n] == REVEALED and n != i:
+                    others.add(n)
+        for j in others:
+            other_unknown, other_remaining = self.constraint(j)
+            outside = other_unknown - unknown
+            if other_remaining - remaining == len(outside):
+                safe = unknown - other_unknown
+                if outside or safe:
+                    for u in outside:
+                        self.set_state(u, MINE)
+                    for u in safe:
+                        self.set_state(u, SAFE)
+                    return
+            outside = unknown - other_unknown
+            if remaining - other_remaining == len(outside):
+                safe = other_unknown - unknown
+                if outside or safe:
+                    for u in outside:
+                        self.set_state(u, MINE)
+                    for u in safe:
+                        self.set_state(u, SAFE)
+                    return
+
+
+    def apply_mine_count(self):
+        """
+        Global rule: if every mine is known the unknowns are safe, and if
+        every unknown must be a mine they are mines
+        :return: bool, whether anything was deduced
+        """
+        if self.mines is None or self.unknown == 0:
+            return False
+        left = self.mines - self.known_mines
+        if left != 0 and left != self.unknown:
+            return False
+        state = MINE if left else SAFE
+        for i in xrange(self.size):
+            if self.state[i] == UNKNOWN:
+                self.set_state(i, state)
+        return True
+
+
+class LogicPlay(object):
+    """
+    Plays an engine's layout by logic alone from a first click, without
+    changing the engine's state. run() stops where a guess would be needed;
+    if the layout is then changed, recount() hands the deducer the new
+    numbers of the cells already open and run() carries on from there.
+
+    The cells around the open area, and the hidden cells away from it, are
+    kept as it grows rather than found by scanning the board, since a
+    layout may be repaired hundreds of times.
+    """
+    def __init__(self, engine, start):
+        """
+        :param engine: Engine with mines already placed
+        :param start: int, flat index of the first click, a safe cell
+        """
+        self.engine = engine
+        self.deducer = Deducer((engine.offsets, engine.adjacency), engine.mines)
+        self.opened = bytearray(engine.size)
+        self.revealed = 0
+        self.to_open = [start]
+        self.border = set()  # neighbors of open cells, pruned by frontier()
+        self.spaces = None  # candidates for space(), listed on its first call
+
+
+    def run(self):
+        """
+        Open every cell that can be proven safe
+        :return: bool, True once every safe cell is open, False if stuck
+        """
+        engine = self.engine
+        deducer = self.deducer
+        opened = self.opened
+        to_open = self.to_open
+        border = self.border
+        safe_cells = engine.size - engine.mines
+        while True:
+            # open the cells, flooding through empty ones
+            while to_open:
+                i = to_open.pop()
+                if opened[i]:
+                    continue
+                opened[i] = 1
+                self.revealed += 1
+                deducer.reveal(i, engine.neighbors[i])
+                border.update(deducer.neighbors(i))
+                if engine.neighbors[i] == 0:
+                    to_open.extend(n for n in deducer.neighbors(i) if not opened[n])
+            if self.revealed == safe_cells:
+                return True
+            safe, mines = deducer.run()
+            to_open.extend(i for i in safe if not opened[i])
+            if not to_open:
+                return False
+
+
+    def recount(self, cells):
+        """
+        Give the deducer the current numbers of the open cells among cells,
+        after mines were moved between cells it knew nothing about. What it
+        had deduced stays true, since those cells kept their contents.
+        """
+        for i in cells:
+            if self.opened[i]:
+                self.deducer.reveal(i, self.engine.neighbors[i])
+                if self.engine.neighbors[i] == 0:
+                    # an empty cell opens its neighbors, as a flood would
+                    self.to_open.extend(n for n in self.deducer.neighbors(i) if not self.opened[n])
+
+
+    def frontier(self):
+        """
+        :return: sorted list of the cells the deducer knows nothing about that border an open cell
+        """
+        state = self.deducer.state
+        # a cell the deducer has learned something about never goes back to unknown
+        self.border = border = set(i for i in self.border if state[i] == UNKNOWN)
+        return sorted(border)
+
+
+    def space(self, rng):
+        """
+        Pick a cell to move a mine to: one without a mine that the deducer
+        knows nothing about and that touches no open cell, so no number in
+        play changes when a mine lands there. The candidates are listed once
+        and pruned as they're drawn; a cell that stops being one never
+        becomes one again, as the open area only grows and mines only leave
+        cells next to it.
+        :param rng: random.Random to draw with
+        :return: flat index, or None if there is no such cell
+        """
+        state = self.deducer.state
+        neighbors = self.deducer.neighbors
+        opened = self.opened
+        is_mine = self.engine.is_mine
+        if self.spaces is None:
+            self.spaces = [i for i in xrange(self.engine.size)
+                           if state[i] == UNKNOWN and not is_mine[i] and not any(opened[n] for n in neighbors(i))]
+        spaces = self.spaces
+        while spaces:
+            k = rng.randrange(len(spaces))
+            i = spaces[k]
+            if state[i] == UNKNOWN and not is_mine[i] and not any(opened[n] for n in neighbors(i)):
+                return i
+            spaces[k] = spaces[-1]
+            spaces.pop()
+        return None
+
+
+def solvable_without_guessing(engine, start):
+    """
+    Play the engine's layout by logic alone, starting with a click on start,
+    without changing the engine's state.
+    :param engine: Engine with mines already placed
+    :param start: int, flat index of the first click
+    :return: bool, True if every safe cell gets revealed without a guess
+    """
+    if engine.is_mine[start]:
+        return False
+    return LogicPlay(engine, start).run()
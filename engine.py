@@ -0,0 +1,603 @@
+import random
+from array import array
+from collections import deque
+from deduction import LogicPlay
+import instrument
+
+# numpy is optional; without it the engine still works on plain bytearrays
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+MASK64 = (1 << 64) - 1
+
+# board generation modes:
+# classic  - mines placed before the first click, which may hit one
+# safe     - mines placed on the first click, never under it
+# opening  - mines placed on the first click, never under or around it, so it opens an area
+# no_guess - like opening, repaired until logic alone can clear the board
+MODES = ('classic', 'safe', 'opening', 'no_guess')
+
+# no_guess moves up to NO_GUESS_REPAIRS mines in a layout before trying a new one,
+# and gives up after NO_GUESS_LAYOUTS layouts
+NO_GUESS_REPAIRS = 200
+NO_GUESS_LAYOUTS = 20
+
+
+def derive_seed(seed, stream):
+    """
+    Derive an independent 64-bit seed for a numbered stream (e.g. game or
+    worker number) from a base seed using the splitmix64 mixer. Nearby
+    inputs give unrelated outputs, so game k of a batch gets the same layout
+    no matter which worker plays it, and workers never share layouts.
+    :param seed: int, base seed
+    :param stream: int, stream number
+    :return: int in [0, 2**64)
+    """
+    z = (seed + (stream + 1) * 0x9E3779B97F4A7C15) & MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+
+def sample_cells(size, count, rng, exclude=()):
+    """
+    Pick exactly count distinct cell indices out of range(size), never
+    choosing one in exclude. Uses a partial Fisher-Yates shuffle over a
+    virtual array whose swapped slots are kept in a dict, so time and memory
+    are O(count) regardless of board size.
+    :param size: int, number of cells on the board
+    :param count: int, number of cells to pick
+    :param rng: random.Random instance supplying the randomness
+    :param exclude: iterable of indices that must not be picked
+    :return: list of indices
+    """
+    exclude = sorted(set(exclude))
+    available = size - len(exclude)
+    if count > available:
+        raise ValueError("can't place %d mines in %d free cells" % (count, available))
+
+    picked = []
+    swaps = {}
+    for k in xrange(count):
+        j = rng.randrange(k, available)
+        picked.append(swaps.get(j, j))
+        swaps[j] = swaps.get(k, k)
+
+    if exclude:
+        # map positions in the free cells back to board indices by skipping excluded cells
+        for p in xrange(len(picked)):
+            i = picked[p]
+            for e in exclude:
+                if i >= e:
+                    i += 1
+                else:
+                    break
+            picked[p] = i
+    return picked
+
+
+# (rows, cols) -> neighbor table, shared by every engine and solver on boards of that size
+neighbor_tables = {}
+
+# (row, col) offsets of the 8 neighbors, in the order the tables list them
+NEIGHBOR_OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+
+
+def neighbor_table(rows, cols):
+    """
+    Neighbor indices of every cell of a board size in compressed sparse row
+    form: the neighbors of cell i are adjacency[offsets[i]:offsets[i + 1]],
+    in row-major order and clipped at the edges. Built once per size and cached.
+    :return: (offsets, adjacency), both array('i'); offsets has rows * cols + 1 entries
+    """
+    key = (rows, cols)
+    if key in neighbor_tables:
+        return neighbor_tables[key]
+    size = rows * cols
+    if numpy is not None:
+        index = numpy.arange(size, dtype=numpy.int32).reshape(rows, cols)
+        # one column per direction, -1 where the neighbor is off the board
+        table = numpy.full((rows, cols, 8), -1, dtype=numpy.int32)
+        for d, (dr, dc) in enumerate(NEIGHBOR_OFFSETS):
+            table[max(0, -dr):rows - max(0, dr), max(0, -dc):cols - max(0, dc), d] = \
+                index[max(0, dr):rows + min(0, dr), max(0, dc):cols + min(0, dc)]
+        table = table.reshape(size, 8)
+        valid = table >= 0
+        offsets = numpy.zeros(size + 1, dtype=numpy.int32)
+        numpy.cumsum(valid.sum(axis=1), out=offsets[1:])
+        result = array('i', offsets.astype(numpy.intc).tostring()), \
+            array('i', table[valid].astype(numpy.intc).tostring())
+    else:
+        offsets = array('i', [0])
+        adjacency = array('i')
+        for row in xrange(rows):
+            for col in xrange(cols):
+                for dr, dc in NEIGHBOR_OFFSETS:
+                    if 0 <= row + dr < rows and 0 <= col + dc < cols:
+                        adjacency.append((row + dr) * cols + col + dc)
+                offsets.append(len(adjacency))
+        result = offsets, adjacency
+    neighbor_tables[key] = result
+    return result
+
+
+def check_mode(rows, cols, mines, mode):
+    """
+    Generate one board in the mode from a corner, where the opening is
+    smallest, so a no_guess board too crowded to clear by logic is refused
+    before any game starts instead of on its first click
+    :raises ValueError: if the mode is unknown or its boards can't be generated at this size
+    """
+    engine = Engine(rows, cols, mines, seed=0, mode=mode)
+    if mode == 'no_guess':
+        engine.generate(0)
+
+
+class Engine(object):
+    """
+    Pure-Python game state for one board: mine layout, neighbor counts,
+    reveal/flag state and win/loss. Nothing in here touches pygame, so games
+    can be played without opening a display.
+
+    Cells are addressed by flat index: index = row * cols + col
+
+    Each layer of state is a contiguous bytearray with one uint8 per cell:
+    is_mine, revealed and flagged hold 0/1, neighbors holds the mine count.
+    grid() exposes any layer as a (rows, cols) numpy array sharing the same memory.
+
+    Every layout comes from a per-game seed (self.seed), so any game can be
+    reproduced exactly with Engine(rows, cols, mines, seed, mode) and the same first click.
+    Outside classic mode the mines aren't placed until the first reveal (see MODES).
+
+    With track_changes, every cell whose appearance changes is appended to
+    self.changed, and redraw_all is set when the whole board changes, so a
+    renderer only has to redraw those cells. Headless games leave it off.
+
+    Neighbors come from the shared neighbor_table() for the board size,
+    kept as self.offsets and self.adjacency.
+    """
+    name = 'array'
+
+    def __init__(self, rows, cols, mines, seed=None, mode='classic', track_changes=False):
+        if mode not in MODES:
+            raise ValueError("unknown board generation mode %r, expected one of %s" % (mode, ", ".join(MODES)))
+        self.rows = rows
+        self.cols = cols
+        self.mines = mines
+        self.mode = mode
+        self.size = rows * cols
+        self.offsets, self.adjacency = neighbor_table(rows, cols)
+        self.changed = [] if track_changes else None
+        self.reset(seed)
+
+
+    def reset(self, seed=None):
+        """
+        Clear all cell state and spawn mines at new locations
+        :param seed: int seed for this game's layout; drawn from the global
+                     random module when None
+        """
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.seed = seed
+        self.rng = random.Random(seed)
+
+        self.allocate()
+        self.detonated = None  # index of the mine that was clicked, if any
+        self.mine_locations = []
+        self.score = 0
+        self.lost = False
+        self.won = False
+
+        # running counters so win checks don't scan the board
+        self.hidden_safe = self.size - self.mines  # safe cells not revealed yet
+        self.correct_flags = 0  # flags on mines
+        self.wrong_flags = 0  # flags on safe cells
+
+        self.redraw_all = True
+        self.placed = False
+        if self.mode == 'classic':
+            self.place_mines()
+
+
+    def allocate(self):
+        """
+        Create empty cell state layers
+        """
+        self.is_mine = bytearray(self.size)
+        self.revealed = bytearray(self.size)
+        self.flagged = bytearray(self.size)
+        self.neighbors = bytearray(self.size)
+
+
+    @instrument.timed('engine.generate')
+    def generate(self, first):
+        """
+        Place the mines for the current mode around the first clicked cell
+        :param first: int, flat index of the first cell revealed
+        """
+        if self.mode == 'safe':
+            self.place_mines([first])
+            return
+
+        exclude = [first]
+        exclude.extend(self.get_neighbors(first))
+        if self.size - len(exclude) < self.mines:
+            # too crowded to leave an opening; settle for a safe first click
+            exclude = [first]
+        self.place_mines(exclude)
+        if self.mode == 'no_guess':
+            self.make_solvable(first, exclude)
+
+
+    def make_solvable(self, first, exclude):
+        """
+        Repair the layout until logic alone clears it from the first click.
+        Logic is played until it gets stuck; then a mine next to the open area
+        moves to a hidden cell away from it, which changes the numbers the
+        logic was stuck on, and play carries on from where it stopped. Cells
+        the logic already worked out keep their contents, but a deduction may
+        have rested on a number that changed, so a repaired layout is played
+        again from the first click before it's accepted, and repaired from
+        wherever that play gets stuck.
+        :param first: int, flat index of the first click
+        :param exclude: cells of the opening, kept free of mines
+        :raises ValueError: if no layout is found within the limits, e.g. on a board crowded with mines
+        """
+        play = LogicPlay(self, first)
+        layouts = 1
+        repairs = 0
+        repaired = False  # whether play has seen mines move
+        while True:
+            if play.run():
+                if not repaired:
+                    return
+                # check it from the first click, carrying on from this play if it gets stuck
+                play = LogicPlay(self, first)
+                repaired = False
+                continue
+
+            stuck = [i for i in play.frontier() if self.is_mine[i]]
+            dst = play.space(self.rng) if stuck and repairs < NO_GUESS_REPAIRS else None
+            if dst is not None:
+                src = self.rng.choice(stuck)
+                self.move_mine(src, dst)
+                changed = list(self.get_neighbors(src))
+                changed.extend(self.get_neighbors(dst))
+                play.recount(changed)
+                repairs += 1
+                repaired = True
+                continue
+
+            if layouts == NO_GUESS_LAYOUTS:
+                # leave the engine unplaced, so another first click can try again
+                self.clear_mines()
+                raise ValueError("no layout of %d mines on a %dx%d board found that can be solved without "
+                                 "guessing from cell %d; try fewer mines" % (self.mines, self.rows, self.cols, first))
+            self.clear_mines()
+            self.place_mines(exclude)
+            play = LogicPlay(self, first)
+            layouts += 1
+            repairs = 0
+            repaired = False
+
+
+    def clear_mines(self):
+        self.is_mine[:] = bytearray(self.size)
+        self.neighbors[:] = bytearray(self.size)
+        del self.mine_locations[:]
+        self.placed = False
+
+
+    def place_mines(self, exclude=()):
+        """
+        Spawn exactly self.mines mines at random cells drawn from self.rng and
+        calculate new neighbor values for each cell
+        :param exclude: indices of cells that must stay free of mines
+        """
+        self.set_mines(sample_cells(self.size, self.mines, self.rng, exclude))
+
+
+    def set_mines(self, indices):
+        """
+        Lay mines on exactly the given cells, e.g. a layout loaded from a game
+        record, and calculate new neighbor values for each cell
+        :param indices: flat indices of the mines, self.mines of them, on a board without mines
+        """
+        for i in indices:
+            self.is_mine[i] = 1
+            self.mine_locations.append(self.position(i))
+        self.count_neighbors()
+        self.finish_placing()
+
+
+    def finish_placing(self):
+        """
+        Mark the layout as placed, once the mines and counts are set
+        """
+        self.placed = True
+        if self.correct_flags or self.wrong_flags:
+            # flags planted before the mines existed; sort them into right and wrong
+            flags = sum(self.flagged)
+            self.correct_flags = sum(1 for row, col in self.mine_locations
+                                     if self.flagged[self.index(row, col)])
+            self.wrong_flags = flags - self.correct_flags
+
+
+    def count_neighbors(self):
+        """
+        Recompute every cell's neighboring mine count from the mine layer.
+        With numpy this is one pass of shifted-array sums over the padded mine
+        mask (a 3x3 box filter minus the center); without it each mine adds
+        one to its neighbors, which is O(mines) instead of O(cells).
+        """
+        if numpy is not None:
+            mines = self.grid(self.is_mine)
+            padded = numpy.zeros((self.rows + 2, self.cols + 2), dtype=numpy.uint8)
+            padded[1:-1, 1:-1] = mines
+            # box filter is separable: sum columns of 3, then rows of 3
+            horizontal = padded[:, :-2] + padded[:, 1:-1] + padded[:, 2:]
+            counts = horizontal[:-2] + horizontal[1:-1] + horizontal[2:]
+            counts -= mines
+            self.grid(self.neighbors)[:] = counts
+        else:
+            self.neighbors[:] = bytearray(self.size)
+            for row, col in self.mine_locations:
+                for n in self.get_neighbors(self.index(row, col)):
+                    self.neighbors[n] += 1
+
+
+    def move_mine(self, src, dst):
+        """
+        Move the mine at index src to the empty cell dst, updating only the
+        neighbor counts around the two cells
+        """
+        self.is_mine[src] = 0
+        for n in self.get_neighbors(src):
+            self.neighbors[n] -= 1
+        self.is_mine[dst] = 1
+        for n in self.get_neighbors(dst):
+            self.neighbors[n] += 1
+        self.mine_locations.remove(self.position(src))
+        self.mine_locations.append(self.position(dst))
+        self.move_flag_counts(src, dst)
+
+
+    def move_flag_counts(self, src, dst):
+        """
+        Keep the flag counters right when the mine at src moves to dst: a
+        flag planted before the first click turns wrong if its mine leaves,
+        and right if one arrives
+        """
+        if self.flagged[src]:
+            self.correct_flags -= 1
+            self.wrong_flags += 1
+        if self.flagged[dst]:
+            self.wrong_flags -= 1
+            self.correct_flags += 1
+
+
+    def snapshot(self):
+        """
+        :return: copy of the whole game state, for restore()
+        """
+        return (bytearray(self.is_mine), bytearray(self.revealed), bytearray(self.flagged),
+                bytearray(self.neighbors), list(self.mine_locations), self.detonated, self.score,
+                self.lost, self.won, self.hidden_safe, self.correct_flags, self.wrong_flags, self.placed,
+                self.seed, self.rng.getstate())
+
+
+    def restore(self, state):
+        """
+        Return to a state taken by snapshot(). The layers are copied into the
+        existing bytearrays, so views of them stay valid, and the whole board is redrawn.
+        """
+        is_mine, revealed, flagged, neighbors, mine_locations, self.detonated, self.score, \
+            self.lost, self.won, self.hidden_safe, self.correct_flags, self.wrong_flags, self.placed, \
+            self.seed, rng_state = state
+        # the rng too, so mines not placed yet at the snapshot are placed the same way again
+        self.rng.setstate(rng_state)
+        self.is_mine[:] = is_mine
+        self.revealed[:] = revealed
+        self.flagged[:] = flagged
+        self.neighbors[:] = neighbors
+        self.mine_locations[:] = mine_locations
+        self.redraw_all = True
+        if self.changed is not None:
+            del self.changed[:]
+
+
+    def grid(self, layer):
+        """
+        :param layer: one of the engine's bytearrays, e.g. engine.is_mine
+        :return: writable (rows, cols) uint8 numpy view of the layer
+        """
+        return numpy.frombuffer(layer, dtype=numpy.uint8).reshape(self.rows, self.cols)
+
+
+    def index(self, row, col):
+        return row * self.cols + col
+
+
+    def position(self, i):
+        """
+        :return: (row, col) tuple for flat index i
+        """
+        return divmod(i, self.cols)
+
+
+    def get_neighbors(self, i):
+        """
+        :return: array of flat indices surrounding cell i, clipped at the board edges
+        """
+        return self.adjacency[self.offsets[i]:self.offsets[i + 1]]
+
+
+    def frontier(self):
+        """
+        :return: sorted list of the hidden, unflagged cells next to a revealed safe cell
+        """
+        revealed = self.revealed
+        flagged = self.flagged
+        frontier = set()
+        for i in xrange(self.size):
+            if revealed[i] and not self.is_mine[i]:
+                frontier.update(n for n in self.get_neighbors(i) if not revealed[n] and not flagged[n])
+        return sorted(frontier)
+
+
+    @property
+    def finished(self):
+        return self.lost or self.won
+
+
+    @instrument.timed('engine.reveal')
+    def reveal(self, i):
+        """
+        Mark a cell as revealed and if it's not a mine
+        either show its neighbor count or reveal its empty neighbors.
+        Every newly revealed safe cell counts toward the score.
+        Revealing a mine loses the game and reveals the whole board.
+        :param i: int, flat index of cell to reveal
+        :return: list of newly revealed indices
+        """
+        if not self.placed:
+            self.generate(i)
+        if self.revealed[i]:
+            return []
+        if self.is_mine[i]:
+            return self.detonate(i)
+        opened = self.reveal_neighbors(i)
+        self.count_opened(opened)
+        return opened
+
+
+    @instrument.timed('engine.chord')
+    def chord(self, i):
+        """
+        Chord on a revealed number: if exactly as many of its neighbors are
+        flagged as the number shows, reveal all its other hidden neighbors
+        (flooding from empty ones) in one batch, with one score and win update.
+        If a flag is wrong, one of those neighbors is a mine and the game is lost.
+        :param i: int, flat index of a revealed cell
+        :return: list of newly revealed indices; empty if the chord doesn't apply
+        """
+        revealed = self.revealed
+        flagged = self.flagged
+        if not revealed[i] or self.is_mine[i]:
+            return []
+        neighbors = self.get_neighbors(i)
+        if sum(flagged[n] for n in neighbors) != self.neighbors[i]:
+            return []
+        hidden = [n for n in neighbors if not revealed[n] and not flagged[n]]
+        for n in hidden:
+            if self.is_mine[n]:
+                return self.detonate(n)
+        opened = []
+        for n in hidden:
+            # an earlier neighbor's flood may have opened it already
+            if not revealed[n]:
+                opened.extend(self.reveal_neighbors(n))
+        self.count_opened(opened)
+        return opened
+
+
+    def detonate(self, i):
+        """
+        Reveal the mine at i, which loses the game and reveals the whole board
+        :return: [i]
+        """
+        self.revealed[i] = 1
+        self.detonated = i
+        self.lost = True
+        self.reveal_all()
+        return [i]
+
+
+    def count_opened(self, opened):
+        """
+        Update the score, counters and changed cells for newly revealed safe cells
+        """
+        if self.changed is not None:
+            self.changed.extend(opened)
+        self.score += len(opened)
+        self.hidden_safe -= len(opened)
+        self.update_won()
+
+
+    def reveal_neighbors(self, i):
+        """
+        Reveal cell i and flood outward through empty cells with a
+        breadth-first queue. Each cell is marked revealed when queued, so it is
+        visited at most once; flagged cells are left alone.
+        :param i: int, flat index of a safe cell
+        :return: list of newly revealed indices
+        """
+        revealed = self.revealed
+        flagged = self.flagged
+        neighbors = self.neighbors
+        offsets = self.offsets
+        adjacency = self.adjacency
+        revealed[i] = 1
+        opened = [i]
+        queue = deque()
+        if neighbors[i] == 0:
+            queue.append(i)
+        while queue:
+            j = queue.popleft()
+            for n in adjacency[offsets[j]:offsets[j + 1]]:
+                if not revealed[n] and not flagged[n]:
+                    revealed[n] = 1
+                    opened.append(n)
+                    if neighbors[n] == 0:
+                        queue.append(n)
+        return opened
+
+
+    @instrument.timed('engine.flag')
+    def toggle_flag(self, i):
+        """
+        Flag or unflag cell i; revealed cells can't be flagged
+        """
+        if not self.revealed[i]:
+            self.flagged[i] ^= 1
+            if self.changed is not None:
+                self.changed.append(i)
+            change = 1 if self.flagged[i] else -1
+            if self.is_mine[i]:
+                self.correct_flags += change
+            else:
+                self.wrong_flags += change
+            self.update_won()
+
+
+    def reveal_all(self):
+        """
+        Game over: reveal every cell on the board
+        """
+        self.revealed[:] = b'\x01' * self.size
+        self.redraw_all = True
+
+
+    def update_won(self):
+        """
+        Sets self.won from the running counters.
+        Winning conditions:
+        All cells revealed or with flags
+        All mines have flags
+        No cells without mines have flags
+        """
+        if not self.lost:
+            self.won = (self.hidden_safe == 0 and self.wrong_flags == 0
+                        and self.correct_flags == self.mines)
+
+
+    def check_win(self):
+        """
+        Tests whether the board is in a winning position; constant time,
+        since self.won is kept up to date by every move
+        :return: bool
+        """
+        return self.won
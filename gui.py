@@ -7,21 +7,30 @@ from pygame.locals import *  # for keypress constants
 from colors import *  # for color constants
 from cell import Cell
 from board import Board
+import assets
+import instrument
 
 class Gui(object):
 
     def __init__(self, board, game):
-        self.header_height = 36
+        self.header_height = board.header_height
         self.button_icon = None
         self.auto_icon = None
         self.board = board
         self.game = game
-
-        # store the absolute filepath of the script; needed later to access assets by absolute path
-        self.filepath = os.path.split(os.path.realpath(__file__))[0]
+        self.drawn_state = None  # (score, seconds, lost, won) shown by the last draw
 
 
+    @instrument.timed('render.header')
     def draw(self):
+        """
+        Redraw the header if the score, timer or game state changed since the last draw
+        :return: rect of the header if it was drawn, else None
+        """
+        state = (self.game.score, int(self.game.time_elapsed), self.game.lost_game, self.game.won_game)
+        if state == self.drawn_state:
+            return None
+        self.drawn_state = state
 
         # draw labels
         font_color = red
@@ -39,50 +48,38 @@ class Gui(object):
         pygame.draw.rect(self.board.screen, black, timer_rect_bg, 0)
 
 
-        # need to get absolute pathname for font file
-        path = os.path.join(self.filepath, "assets/fonts/DS-DIGIB.ttf")
-        label_font = pygame.font.Font(path, font_size)
-
         # score
         score_text = "{:0>3d}".format(self.game.score) # pad score w/ 0s
-        score_label = label_font.render(score_text, 1, font_color)
-        self.board.screen.blit(score_label, (text_inset, text_inset))
+        assets.draw_digits(self.board.screen, score_text, (text_inset, text_inset), font_size, font_color)
 
         # timer
         time_text = "{:0>3d}".format(int(self.game.time_elapsed)) # pad score w/ 0s
-        time_label = label_font.render(time_text, 1, font_color)
-        self.board.screen.blit(time_label, (self.board.width - (text_inset+50), text_inset))
+        assets.draw_digits(self.board.screen, time_text, (self.board.width - (text_inset+50), text_inset),
+                           font_size, font_color)
 
-        # buttons        
-        self.auto_icon = pygame.sprite.Sprite() # create sprite
-        auto_icon_path = os.path.join(self.filepath, "assets/images/play_20.png")
-        self.auto_icon.image = pygame.image.load(auto_icon_path).convert() # load flagimage
-        self.auto_icon.rect = self.auto_icon.image.get_rect() # use image extent values
-        self.auto_icon.rect.topleft = (60,5)
+        # buttons; sprites are kept so their rects can be used for click collisions
+        if self.auto_icon == None:
+            self.auto_icon = pygame.sprite.Sprite() # create sprite
+            self.auto_icon.image = assets.image("play_20.png")
+            self.auto_icon.rect = self.auto_icon.image.get_rect() # use image extent values
+            self.auto_icon.rect.topleft = (60,5)
         self.board.screen.blit(self.auto_icon.image, self.auto_icon.rect)
 
-        # draw the playing, winning or losing icon
-        if self.game.lost_game:
-            icon = pygame.sprite.Sprite() # create sprite
-            icon_path = os.path.join(self.filepath, "assets/images/button_frown.png")
-            icon.image = pygame.image.load(icon_path).convert() # load flagimage
-            icon.rect = icon.image.get_rect() # use image extent values
-            icon.rect.topleft = [self.board.width/2 - self.button_icon.rect.width/2, self.header_height/2 - icon.rect.height/2]
-            self.board.screen.blit(icon.image, icon.rect)
-        elif self.game.won_game:
-            icon = pygame.sprite.Sprite() # create sprite
-            icon_path = os.path.join(self.filepath, "assets/images/button_glasses.png")
-            icon.image = pygame.image.load(icon_path).convert() # load flagimage
-            icon.rect = icon.image.get_rect() # use image extent values
-            icon.rect.topleft = [self.board.width/2 - self.button_icon.rect.width/2, self.header_height/2 - icon.rect.height/2]
-            self.board.screen.blit(icon.image, icon.rect)
-        else:
-            if self.button_icon == None:
-                self.button_icon = pygame.sprite.Sprite() # create sprite
-                icon_path = os.path.join(self.filepath, "assets/images/button_smile.png")
-                self.button_icon.image = pygame.image.load(icon_path).convert() # load flagimage
+        if self.button_icon == None:
+            self.button_icon = pygame.sprite.Sprite() # create sprite
+            self.button_icon.image = assets.image("button_smile.png")
             # place icon in center of header
             self.button_icon.rect = self.button_icon.image.get_rect() # use image extent values
             self.button_icon.rect.topleft = [self.board.width/2 - self.button_icon.rect.width/2,
                                              self.header_height/2 - self.button_icon.rect.height/2]
-            self.board.screen.blit(self.button_icon.image, self.button_icon.rect)
+
+        # draw the playing, winning or losing icon
+        if self.game.lost_game:
+            icon = assets.image("button_frown.png")
+        elif self.game.won_game:
+            icon = assets.image("button_glasses.png")
+        else:
+            icon = self.button_icon.image
+        self.board.screen.blit(icon, (self.button_icon.rect.x, self.header_height/2 - icon.get_height()/2))
+
+        return score_rect
@@ -0,0 +1,212 @@
+"""
+Optional timers, counters and per-move events, for seeing where a game
+spends its time without attaching a profiler.
+
+Instrumentation is off until enable() is called. Functions marked with
+timed() are left untouched until then: enable() swaps a timing wrapper in
+for each wherever it's defined, and disable() puts the original back, so
+they cost nothing while instrumentation is off. Inline hooks read the
+module's active Stats and do nothing when it is None, which costs one
+global lookup:
+
+    @instrument.timed('engine.reveal')
+    def reveal(self, i):
+        ...
+
+    stats = instrument.active
+    if stats is not None:
+        stats.count('cells_opened', len(opened))
+
+A reference to a timed function taken before enable(), e.g. a bound
+method kept in a local, goes on calling the function it was taken from.
+
+Timer names are prefixed by layer: engine.*, solver.*, render.* and app.*
+for the Minesweeper app's own handlers.
+"""
+import sys
+import json
+from functools import wraps
+from timeit import default_timer as clock
+
+active = None  # Stats collecting right now, or None when instrumentation is off
+
+hooks = []  # [function, timer name, timing wrapper] for every function marked with timed()
+
+
+class Stats(object):
+    """
+    Cumulative counters and timers, plus listeners for per-move events
+    """
+    def __init__(self):
+        self.counters = {}   # name -> int
+        self.timers = {}     # name -> [calls, total seconds, longest call in seconds]
+        self.listeners = []  # functions(move, opened, seconds)
+
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+
+    def record(self, name, seconds):
+        """
+        Add one timed call to a timer
+        """
+        timer = self.timers.get(name)
+        if timer is None:
+            self.timers[name] = [1, seconds, seconds]
+        else:
+            timer[0] += 1
+            timer[1] += seconds
+            if seconds > timer[2]:
+                timer[2] = seconds
+
+
+    def subscribe(self, listener):
+        """
+        :param listener: function(move, opened, seconds) called after every move
+                         played, by the solver or by hand
+        """
+        self.listeners.append(listener)
+
+
+    def unsubscribe(self, listener):
+        self.listeners.remove(listener)
+
+
+    def move(self, move, opened, seconds):
+        """
+        Record a move applied to the engine and pass it on to the listeners
+        :param move: strategies.Move
+        :param opened: list of flat indices the move revealed
+        :param seconds: time the engine took to apply it
+        """
+        self.count('moves')
+        self.count('moves.' + move.kind)
+        if move.guess:
+            self.count('guesses')
+        self.count('cells_opened', len(opened))
+        self.record('move.' + move.kind, seconds)
+        for listener in self.listeners:
+            listener(move, opened, seconds)
+
+
+    def export(self):
+        """
+        :return: JSON-friendly dict of every counter and timer
+        """
+        return {"counters": dict(self.counters),
+                "timers": dict((name, {"calls": calls, "seconds": seconds, "max": longest})
+                               for name, (calls, seconds, longest) in self.timers.iteritems())}
+
+
+    def merge(self, exported):
+        """
+        Add the stats exported by another Stats, e.g. from a worker process
+        """
+        for name, n in exported["counters"].iteritems():
+            self.count(name, n)
+        for name, timer in exported["timers"].iteritems():
+            mine = self.timers.setdefault(name, [0, 0.0, 0.0])
+            mine[0] += timer["calls"]
+            mine[1] += timer["seconds"]
+            mine[2] = max(mine[2], timer["max"])
+
+
+    def dump(self, path):
+        with open(path, "w") as f:
+            json.dump(self.export(), f, indent=2, sort_keys=True)
+
+
+    def report(self):
+        """
+        :return: str, one line per timer and counter
+        """
+        lines = ["%-24s %10s %12s %12s %12s" % ("timer", "calls", "total ms", "mean us", "max us")]
+        for name, (calls, seconds, longest) in sorted(self.timers.iteritems()):
+            lines.append("%-24s %10d %12.1f %12.1f %12.1f" % (
+                name, calls, 1e3 * seconds, 1e6 * seconds / calls, 1e6 * longest))
+        for name, n in sorted(self.counters.iteritems()):
+            lines.append("%-24s %10d" % (name, n))
+        return "\n".join(lines)
+
+
+def enable(stats=None):
+    """
+    Start collecting
+    :param stats: Stats to collect into; a new one when None
+    :return: the active Stats
+    """
+    global active
+    if active is None:
+        for hook in hooks:
+            function, name, wrapper = hook
+            if wrapper is None:
+                wrapper = hook[2] = timing_wrapper(function, name)
+            replace(function, wrapper)
+    active = stats if stats is not None else Stats()
+    return active
+
+
+def disable():
+    """
+    Stop collecting
+    :return: the Stats that was active, or None
+    """
+    global active
+    stats = active
+    if stats is not None:
+        for function, name, wrapper in hooks:
+            if wrapper is not None:
+                replace(wrapper, function)
+    active = None
+    return stats
+
+
+def timed(name):
+    """
+    Decorator that marks a function to be added to the timer called name on
+    every call while instrumentation is enabled; see the module docstring
+    """
+    def decorate(function):
+        if active is None:
+            hooks.append([function, name, None])
+            return function
+        # defined while collecting, e.g. in a module imported late; time it from the start
+        wrapper = timing_wrapper(function, name)
+        hooks.append([function, name, wrapper])
+        return wrapper
+    return decorate
+
+
+def timing_wrapper(function, name):
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        stats = active
+        if stats is None:
+            # called through a reference taken while enabled
+            return function(*args, **kwargs)
+        start = clock()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            stats.record(name, clock() - start)
+    return wrapper
+
+
+def replace(old, new):
+    """
+    Swap new in for the function old where it is defined: in its module's
+    namespace, or in a class of that module, plain or as a staticmethod or classmethod
+    """
+    module = sys.modules.get(old.__module__)
+    if module is None:
+        return
+    owners = [module]
+    owners.extend(value for value in vars(module).values()
+                  if isinstance(value, type) and value.__module__ == old.__module__)
+    for owner in owners:
+        for key, value in vars(owner).items():
+            if value is old:
+                setattr(owner, key, new)
+            elif isinstance(value, (staticmethod, classmethod)) and value.__func__ is old:
+                setattr(owner, key, type(value)(new))
@@ -1,93 +1,145 @@
 import sys
 import time
-import yaml
-import pygame
-from pygame.locals import *  # for keypress constants
-from cell import Cell
-from board import Board
-from gui import Gui
-import solver
-import colors
+from engine import Engine, MODES, check_mode
+import strategies
+import instrument
+import settings
+from scheduler import Scheduler
+# pygame and the modules drawing with it are imported when a window is
+# opened, so headless games start without them
+
+
+# auto-play speed in moves per second; + and - double or halve it within the limits
+AUTOPLAY_SPEED = 4.0
+MIN_SPEED = .5
+MAX_SPEED = 1024.0
+RESULT_PAUSE = 1.0 # seconds a finished auto-played game stays up before the next one
 
 
 class Minesweeper(object):
     """
     Main game application
     """
-    def __init__(self, difficulty, use_ai, total_games):
-
-        # read settings file
-        with open('settings.yaml', 'r') as f:
-            settings = yaml.load(f)            
-            self.rows = settings[difficulty]["rows"]
-            self.cols = settings[difficulty]["columns"]
-            self.mines = settings[difficulty]["mines"]
-            self.width = settings[difficulty]["width"]
-            self.height = settings[difficulty]["height"]
-            self.size = self.width, self.height
-        
-        # pygame setup
+    def __init__(self, difficulty, use_ai, total_games, headless=False, mode='classic', strategy='probability'):
+
+        # board size from a preset in settings.yaml or a custom ROWSxCOLSxMINES
+        self.rows, self.cols, self.mines = settings.board_size(difficulty)
+        self.cell_size = None  # set by setup_screen, shrunk if the board doesn't fit the display
+
+        # pygame setup; headless games never open a display
+        self.headless = headless
         self._running = True # used to stop game loop        
-        self.screen = self.setup_screen()
+        self.fps = 30 # upper limit on frames drawn per second
+        self.buttons_down = set() # mouse buttons held, to spot both-button chords
+        self.chording = False # set after a both-button chord until its other button comes up
+        self.screen = None if headless else self.setup_screen()
+        self.scheduler = Scheduler() # runs input, frames and auto-play as separate tasks
 
         # scorekeeping
         self.start_time = time.time()
         self.time_elapsed = 0        
-        self.score = 0
-        self.lost_game = False
-        self.won_game = False
 
         # game board setup        
 
 
         # AI / autoplay
         self.use_ai = use_ai        
-
-        # create board and gui 
-        self.board = Board(self.width, self.height, self.rows, self.cols, self.mines, self.screen, 36)    
-        self.gui = Gui(self.board, self)
+        self.strategy = strategy
+        self.total_games = total_games # games played when the auto-play button is clicked
+        self.speed = AUTOPLAY_SPEED
+        self.paused = False
+
+        # create board and gui; headless games only need the engine
+        if headless:
+            self.board = self.gui = None
+            self.engine = Engine(self.rows, self.cols, self.mines, mode=mode)
+        else:
+            from board import Board, HEADER_HEIGHT
+            from gui import Gui
+            self.board = Board(self.rows, self.cols, self.mines, self.screen, HEADER_HEIGHT, mode, self.cell_size)
+            self.engine = self.board.engine
+            self.gui = Gui(self.board, self)
 
         # autoplay or enter event loop        
         if self.use_ai:
             self.autoplay(total_games)
-        self.loop()
+        if not self.headless:
+            self.loop()
+
+
+    @property
+    def score(self):
+        return self.engine.score
+
+    @property
+    def lost_game(self):
+        return self.engine.lost
+
+    @property
+    def won_game(self):
+        return self.engine.won
 
 
 
     def autoplay(self, times_to_play):
         """
-        Automatically play minesweeper a certain number of times.        
+        Automatically play minesweeper a certain number of times. In the window
+        the solver runs as a scheduler task making self.speed moves a second,
+        so input and drawing carry on between its moves; headless games are
+        played straight through.
         :param times_to_play: int
         """
-        for i in range(times_to_play):
+        task = self.autoplay_task(times_to_play)
+        if self.headless:
+            for delay in task:
+                pass
+        else:
+            self.paused = False
+            self.scheduler.spawn('autoplay', task)
+
+
+    def stop_autoplay(self):
+        """
+        Cancel auto-play between two moves
+        :return: True if it was running
+        """
+        self.paused = False
+        return self.scheduler.cancel('autoplay')
+
+
+    def autoplay_task(self, times_to_play):
+        """
+        Play the games one move per step
+        :return: generator yielding the seconds to wait before the next move
+        """
+        import solver
+        for i in xrange(times_to_play):
             print "\n### Playthrough", i
 
-            # draw the starting board; also draws scores
-            self.draw()
+            # pick up a game under way, but start later games on a new board
+            if i or self.engine.finished:
+                self.reset_game()
 
             # play 1 game
+            for move, opened in solver.Solver.play_steps(self, self.strategy):
+                yield 1.0 / self.speed
+                while self.paused:
+                    yield 1.0 / self.fps
 
-            solver.Solver.play_best_guess(self)            
-            
-            # reset board
-            self.reset_game()
+            if i + 1 < times_to_play:
+                yield RESULT_PAUSE
 
 
     def game_over(self):
-        # unflag and reveal all cells
-        for i in xrange(self.rows):
-            for j in xrange(self.cols):
-                self.board.cells[i][j].revealed = True
+        # reveal all cells
+        self.engine.reveal_all()
 
 
     def reset_game(self):
         # reset score and draw new board
-        self.lost_game = False
-        self.won_game = False
-        self.score = 0
         self.start_time = time.time()
         self.time_elapsed = 0
-        self.board.reset()
+        self.engine.reset()
         self.draw()
 
 
@@ -97,54 +149,60 @@ class Minesweeper(object):
         :param i: cell row
         :param j: cell column
         """
-        # do not flag revealed squares
-        if not self.board.cells[i][j].revealed:
-            if self.board.cells[i][j].flagged == True:
-                self.board.cells[i][j].flagged = False
-            else:
-                self.board.cells[i][j].flagged = True
+        # revealed squares are never flagged
+        index = self.engine.index(i, j)
+        start = instrument.clock()
+        self.engine.toggle_flag(index)
+        stats = instrument.active
+        if stats is not None:
+            stats.move(strategies.Move(strategies.FLAG, index), [], instrument.clock() - start)
         if self.test_did_win():
             self.game_over()
 
 
+    @instrument.timed('app.reveal')
     def reveal_cell(self, row, col):
         """
         Mark a cell as revealed and if it's not a mine 
         either display its neighbor count or reveal its empty neighbors.
         :param row: int, row index for cell to reveal in board
         :param col: int, col index for cell to reveal in board
+        :return: list of flat indices of the newly revealed cells
         """
-        cell = self.board.cells[row][col]
-        if cell.is_mine == True:
+        index = self.engine.index(row, col)
+        start = instrument.clock()
+        try:
+            opened = self.engine.reveal(index)
+        except ValueError as e:
+            # no_guess found no layout for this first click; the board stays unplaced
+            print e
+            return []
+        stats = instrument.active
+        if stats is not None:
+            stats.move(strategies.Move(strategies.REVEAL, index), opened, instrument.clock() - start)
+        if self.lost_game:
             print "You lose! Final Score: ", self.score
-            cell.revealed = True
-            cell.detonated = True
-            self.lost_game = True
-            self.game_over()
-        elif cell.neighbors > 0:
-            # cell has a neighbor # value, show it
-            cell.revealed = True
-            self.score += 1
-        else:
-            # cell is empty, reveal all empty neighbors
-            cell.revealed = True
-            self.score += 1
-            self.reveal_neighbors(row, col)
+        return opened
 
 
-    def reveal_neighbors(self, row, col):
+    @instrument.timed('app.chord')
+    def chord_cell(self, row, col):
         """
-        Recursive function that marks all adjacent unrevealed empty cells as revealed
-        :param row: int, row index for cell in board
-        :param col: int, col index for cell in board
+        Chord on a revealed number: if its neighbors hold as many flags as the
+        number, reveal all its other hidden neighbors at once
+        :param row: int, row index of the number in board
+        :param col: int, col index of the number in board
+        :return: list of flat indices of the newly revealed cells
         """
-        neighbors = self.board.get_neighbor_cells(row, col)
-        for cell in neighbors:
-            # if not revealed yet, reveal it and reveal its neighbors
-            if not cell.revealed:
-                cell.revealed = True
-                if cell.neighbors == 0 and cell.is_mine == False:
-                    self.reveal_neighbors(cell.row, cell.col)
+        index = self.engine.index(row, col)
+        start = instrument.clock()
+        opened = self.engine.chord(index)
+        stats = instrument.active
+        if stats is not None:
+            stats.move(strategies.Move(strategies.CHORD, index), opened, instrument.clock() - start)
+        if self.lost_game:
+            print "You lose! Final Score: ", self.score
+        return opened
 
 
     """
@@ -155,8 +213,15 @@ class Minesweeper(object):
         """
         :return: pygame screen object
         """
+        import pygame
+        import colors
+        from board import window_size, display_cell_size
         pygame.init()
-        screen = pygame.display.set_mode(self.size, pygame.HWSURFACE | pygame.DOUBLEBUF)       
+        # shrink the cells if the full-size board wouldn't fit the desktop
+        self.cell_size = display_cell_size(self.rows, self.cols)
+        self.size = window_size(self.rows, self.cols, self.cell_size)
+        # single-buffered so partial display.update() calls keep the rest of the screen
+        screen = pygame.display.set_mode(self.size)
         screen.fill(colors.bg_gray)        
         pygame.display.flip()
         return screen
@@ -164,19 +229,40 @@ class Minesweeper(object):
 
     def loop(self):
         """
-        Game loop that responds to user events
+        Game loop: input, drawing and auto-play are separate scheduler tasks,
+        each run at its own pace, so the window keeps responding while the
+        solver plays. The scheduler sleeps while no task is due, so an idle
+        game uses almost no CPU. Returns when the window is closed.
         """
         self._running = True
-        while (self._running):
-            # increment the game clock if we're playing now
-            if (not self.lost_game) and (not self.won_game):
-                now = time.time()
-                self.time_elapsed = now - self.start_time
-            # listen for user input events
+        self.scheduler.spawn('input', self.input_task())
+        self.scheduler.spawn('render', self.render_task())
+        self.scheduler.run()
+
+
+    def input_task(self):
+        """
+        Handle the queued events self.fps times a second, until the game is quit
+        """
+        import pygame
+        while self._running:
             for event in pygame.event.get():
                 self.on_event(event)
+            yield 1.0 / self.fps
+        self.scheduler.stop()
+
+
+    def render_task(self):
+        """
+        Update the game clock and draw what changed, self.fps times a second
+        """
+        while True:
+            # increment the game clock if we're playing now
+            if (not self.lost_game) and (not self.won_game):
+                self.time_elapsed = time.time() - self.start_time
             # draw the updated game board and score
             self.draw()
+            yield 1.0 / self.fps
 
 
     def on_event(self, event):
@@ -184,19 +270,48 @@ class Minesweeper(object):
         Handle individual events
         :param event: pygame event
         """
-        if event.type == pygame.QUIT:
+        import pygame
+        from pygame.locals import QUIT, KEYDOWN, MOUSEBUTTONDOWN, MOUSEBUTTONUP, K_ESCAPE, K_SPACE, \
+            K_PLUS, K_EQUALS, K_KP_PLUS, K_MINUS, K_KP_MINUS, K_LCTRL
+
+        if event.type == QUIT:
             print "App quitting"
             self._running = False
 
         # keypresses
         elif event.type == KEYDOWN:
             if event.key == K_ESCAPE:
-                self._running = False
+                # escape cancels auto-play if it's running, else quits
+                if not self.stop_autoplay():
+                    self._running = False
+            elif event.key == K_SPACE:
+                # pause or resume auto-play
+                if 'autoplay' in self.scheduler:
+                    self.paused = not self.paused
+            elif event.key in (K_PLUS, K_EQUALS, K_KP_PLUS, K_MINUS, K_KP_MINUS):
+                # faster or slower auto-play, from its next move
+                if event.key in (K_MINUS, K_KP_MINUS):
+                    self.speed = max(self.speed / 2, MIN_SPEED)
+                else:
+                    self.speed = min(self.speed * 2, MAX_SPEED)
+                print "Auto-play speed: %g moves per second" % self.speed
 
         # mouse events
+        elif event.type == MOUSEBUTTONDOWN:
+            self.buttons_down.add(event.button)
+
         elif event.type == MOUSEBUTTONUP:
+            self.buttons_down.discard(event.button)
+            other = {1: 3, 3: 1}.get(event.button)
+            if self.chording:
+                # the second button of a both-button chord; it neither reveals nor flags
+                self.chording = False
+            # middle click, or releasing left or right while the other is held, chords
+            elif event.button == 2 or other in self.buttons_down:
+                self.chord_event(event)
+                self.chording = event.button != 2
             # left-click
-            if event.button == 1:
+            elif event.button == 1:
                 # macs don't have right click, so process control-click as right click
                 key = pygame.key.get_pressed()
                 if key[K_LCTRL]:
@@ -205,26 +320,39 @@ class Minesweeper(object):
                     # left click reveals a cell
                     x,y = event.pos
                     if self.gui.button_icon.rect.collidepoint(x,y):
+                        self.stop_autoplay()
                         self.reset_game()
-                    if self.gui.auto_icon.rect.collidepoint(x,y):
-                        self.autoplay(total_games)
-                        self.reset_game()
+                    elif self.gui.auto_icon.rect.collidepoint(x,y):
+                        # the play button starts auto-play, or stops it
+                        if not self.stop_autoplay():
+                            self.autoplay(self.total_games)
                     else:
-                        for i in xrange(self.rows):
-                            for j in xrange(self.cols):
-                                cell_rect = self.board.cells[i][j].rect
-                                if cell_rect.collidepoint(x,y):
-                                    # if unrevealed, reveal the cell
-                                    if not self.board.cells[i][j].revealed:
-                                        self.reveal_cell(i, j)
-                                        # test if we won or not
-                                        if self.test_did_win():
-                                            self.game_over()
+                        cell = self.board.cell_at(x, y)
+                        if cell is not None:
+                            i, j = cell
+                            # if unrevealed, reveal the cell
+                            if not self.board.cells[i][j].revealed:
+                                self.reveal_cell(i, j)
+                                # test if we won or not
+                                if self.test_did_win():
+                                    self.game_over()
             # right click
             elif event.button == 3:
                 self.flag_event(event)
 
 
+    def chord_event(self, event):
+        """
+        Action taken when a number is middle-clicked or clicked with both buttons
+        :param event: pygame mouse event
+        """
+        cell = self.board.cell_at(*event.pos)
+        if cell is not None:
+            self.chord_cell(*cell)
+            if self.test_did_win():
+                self.game_over()
+
+
     def flag_event(self, event):
         """
         Action taken when screen is right-clicked or ctrl-clicked
@@ -232,24 +360,33 @@ class Minesweeper(object):
         :return:
         """
         x,y = event.pos
-        for i in xrange(self.rows):
-            for j in xrange(self.cols):
-                cell_rect = self.board.cells[i][j].rect
-                if cell_rect.collidepoint(x,y):
-                    self.flag_cell(i, j)
-                    self.draw()
+        cell = self.board.cell_at(x, y)
+        if cell is not None:
+            self.flag_cell(*cell)
+            self.draw()
 
 
+    @instrument.timed('render.frame')
     def draw(self):
-        # Fill background
-        background = pygame.Surface(self.screen.get_size())
-        background = background.convert()
-        background.fill(colors.gray) 
-        self.board.draw()
-        self.gui.draw() # update scoreboard
-        pygame.display.flip() # update screen
-
-
+        """
+        Draw what changed since the last frame and push only those rects to the display
+        """
+        if self.headless:
+            return
+        import pygame
+        rects = self.board.draw()
+        header_rect = self.gui.draw() # update scoreboard
+        if header_rect is not None:
+            rects.append(header_rect)
+        if rects:
+            stats = instrument.active
+            start = instrument.clock()
+            pygame.display.update(rects) # update screen
+            if stats is not None:
+                stats.record('render.present', instrument.clock() - start)
+
+
+    @instrument.timed('app.win_check')
     def test_did_win(self):
         """
         Tests whether the game's board is in a winning position.
@@ -260,25 +397,9 @@ class Minesweeper(object):
         No cells without mines have flags
         :return: bool
         """
-        did_win = True
-        for i in xrange(self.rows):
-            for j in xrange(self.cols):
-                cell = self.board.cells[i][j]
-                # unrevealed and not flagged squares
-                if not cell.revealed and not cell.flagged:
-                    did_win = False
-                    break
-                # incorrect flags
-                if cell.flagged and not cell.is_mine:
-                    did_win = False
-                    break
-                # unflagged mines
-                if cell.is_mine and not cell.flagged:
-                    did_win = False
-                    break
+        did_win = self.engine.check_win()
         if did_win:
             print "You won!"
-            self.won_game = True
 
         return did_win
 
@@ -290,23 +411,41 @@ if __name__ == "__main__":
     difficulty = "easy"
     use_ai = False
     total_games = 5
+    mode = "classic"
+    strategy = "probability"
 
     # command line args override defaults
     if len(sys.argv) > 1:
         difficulty = sys.argv[1].lower()
-        if not (difficulty == "easy" or difficulty == "intermediate" or difficulty == "expert"):
-            print """
-            Error in command line arguments.
-            Usage: python minesweeper.py difficulty use_ai total_games
-            \tdifficulty - easy, intermediate, expert
-            \tuse_ai - t or f
-            \ttotal_games - integer\n"""
-            exit()
-
     if len(sys.argv) > 2:
         if (sys.argv[2].lower() == 't'):
             use_ai = True
     if len(sys.argv) > 3:
         total_games = max(1, int(sys.argv[3])) # at least 1 game
+    if len(sys.argv) > 4:
+        mode = sys.argv[4].lower()
+    if len(sys.argv) > 5:
+        strategy = sys.argv[5].lower()
+
+    # check the arguments before a window opens
+    try:
+        rows, cols, mines = settings.board_size(difficulty)
+        if mode not in MODES:
+            raise ValueError("unknown mode %r" % mode)
+        check_mode(rows, cols, mines, mode)
+        if strategy not in strategies.STRATEGIES:
+            raise ValueError("unknown strategy %r" % strategy)
+    except ValueError as e:
+        print """
+        Error in command line arguments: %s
+        Usage: python minesweeper.py difficulty use_ai total_games mode strategy
+        \tdifficulty - easy, intermediate, expert, another preset in settings.yaml,
+        \t             or a custom size as ROWSxCOLSxMINES, e.g. 40x60x400
+        \tuse_ai - t or f
+        \ttotal_games - integer
+        \tmode - %s
+        \tstrategy - solver strategy for auto-play: %s\n""" % (
+            e, ", ".join(MODES), ", ".join(sorted(strategies.STRATEGIES)))
+        exit()
     
-    app = Minesweeper(difficulty, use_ai, total_games)
+    app = Minesweeper(difficulty, use_ai, total_games, mode=mode, strategy=strategy)
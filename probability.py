@@ -0,0 +1,336 @@
+from __future__ import division
+import random
+from deduction import UNKNOWN
+import instrument
+
+# components with more unknown cells than this are sampled instead of enumerated
+MAX_ENUMERATE = 32
+# enumeration gives up and samples once a component has this many solutions
+MAX_SOLUTIONS = 20000
+# random solutions drawn for a component that is sampled
+SAMPLES = 400
+# memoized component results kept before the cache is cleared
+MAX_CACHED = 5000
+
+
+def comb(n, k):
+    """
+    :return: int, n choose k (0 when k is out of range)
+    """
+    if k < 0 or k > n:
+        return 0
+    k = min(k, n - k)
+    result = 1
+    for i in xrange(1, k + 1):
+        result = result * (n - k + i) // i
+    return result
+
+
+class TooManySolutions(Exception):
+    pass
+
+
+class Guesser(object):
+    """
+    Picks the unknown cell least likely to be a mine when logic runs out.
+
+    The frontier (unknown cells next to revealed numbers) is split into
+    independent components that share no constraint. Each component's
+    consistent mine assignments are enumerated by backtracking and tallied by
+    how many mines they use; the components and the unconstrained cells are
+    then combined, weighting every total by the number of ways the remaining
+    mines fit in the unconstrained cells, to give an exact probability per
+    cell. Component results depend only on their constraints, so they are
+    memoized across guesses and games. Components too big to enumerate are
+    approximated from randomly drawn solutions instead.
+    """
+    def __init__(self, rng=None):
+        self.rng = rng or random.Random()
+        self.cache = {}
+
+
+    @instrument.timed('solver.probability')
+    def safest(self, deducer):
+        """
+        :param deducer: Deducer holding what is known about the board
+        :return: (flat index of the cell to reveal, its mine probability)
+        """
+        probabilities = self.probabilities(deducer)
+        best = min(probabilities.itervalues())
+        choices = sorted(i for i, p in probabilities.iteritems() if p == best)
+        return self.rng.choice(choices), best
+
+
+    def probabilities(self, deducer):
+        """
+        :param deducer: Deducer holding what is known about the board
+        :return: dict of unknown cell index -> probability that it's a mine
+        """
+        state = deducer.state
+        constraints = []
+        for i, number in deducer.numbers.iteritems():
+            unknown, remaining = deducer.constraint(i)
+            if unknown:
+                constraints.append((unknown, remaining))
+
+        components = self.components(constraints)
+        frontier = set()
+        for cells, component_constraints in components:
+            frontier.update(cells)
+        others = [i for i in xrange(deducer.size) if state[i] == UNKNOWN and i not in frontier]
+        mines_left = deducer.mines - deducer.known_mines
+
+        tallies = [self.solve(cells, component_constraints) for cells, component_constraints in components]
+
+        # convolve each component's solution counts by mine total, leaving one component out at a time
+        def convolve(skip):
+            totals = {0: 1}
+            for c, (counts, cell_counts) in enumerate(tallies):
+                if c == skip:
+                    continue
+                combined = {}
+                for s, ways in totals.iteritems():
+                    for k, count in counts.iteritems():
+                        combined[s + k] = combined.get(s + k, 0) + ways * count
+                totals = combined
+            return totals
+
+        everything = convolve(None)
+        weight = sum(ways * comb(len(others), mines_left - s) for s, ways in everything.iteritems())
+        use_count = weight > 0
+        if use_count:
+            fits = lambda s: comb(len(others), mines_left - s)
+        else:
+            # the samples don't agree with the mine count; weigh frontier solutions alone
+            weight = sum(everything.itervalues())
+            fits = lambda s: 1
+
+        probabilities = {}
+        for c, (cells, component_constraints) in enumerate(components):
+            counts, cell_counts = tallies[c]
+            rest = convolve(c)
+            mine_weight = [0] * len(cells)
+            for k, per_cell in cell_counts.iteritems():
+                k_weight = sum(ways * fits(s + k) for s, ways in rest.iteritems())
+                if k_weight:
+                    for n in xrange(len(cells)):
+                        mine_weight[n] += per_cell[n] * k_weight
+            for n, cell in enumerate(cells):
+                # true division of the longs; they can be far past the range of a float
+                probabilities[cell] = mine_weight[n] / weight
+
+        if others:
+            if use_count:
+                mine_weight = sum(ways * comb(len(others) - 1, mines_left - s - 1)
+                                  for s, ways in everything.iteritems())
+                p = mine_weight / weight
+            else:
+                expected = sum(s * ways for s, ways in everything.iteritems()) / weight
+                p = min(1.0, max(0.0, (mines_left - expected) / len(others)))
+            for i in others:
+                probabilities[i] = p
+        return probabilities
+
+
+    def components(self, constraints):
+        """
+        Group constraints that share cells
+        :param constraints: list of (set of unknown cells, mines among them)
+        :return: list of (ordered list of cells, list of constraints)
+        """
+        parent = {}
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for cells, remaining in constraints:
+            for i in cells:
+                parent.setdefault(i, i)
+            first = find(next(iter(cells)))
+            for i in cells:
+                root = find(i)
+                if root != first:
+                    parent[root] = first
+
+        groups = {}
+        for cells, remaining in constraints:
+            groups.setdefault(find(next(iter(cells))), []).append((cells, remaining))
+
+        components = []
+        for group in groups.itervalues():
+            # order cells constraint by constraint so backtracking closes constraints early
+            order = []
+            seen = set()
+            for cells, remaining in group:
+                for i in sorted(cells):
+                    if i not in seen:
+                        seen.add(i)
+                        order.append(i)
+            components.append((order, group))
+        return components
+
+
+    def solve(self, cells, constraints):
+        """
+        Tally the mine assignments of one component that satisfy all its constraints
+        :return: (dict of mines used -> number of solutions,
+                  dict of mines used -> list of solutions with a mine in each cell)
+        """
+        key = tuple(sorted((tuple(sorted(unknown)), remaining) for unknown, remaining in constraints))
+        if key in self.cache:
+            counts, cell_counts, order = self.cache[key]
+            # map the cached cell order onto this component's order
+            position = dict((cell, n) for n, cell in enumerate(order))
+            return counts, dict((k, [per_cell[position[cell]] for cell in cells])
+                                for k, per_cell in cell_counts.iteritems())
+
+        if len(cells) <= MAX_ENUMERATE:
+            try:
+                result = self.enumerate_solutions(cells, constraints)
+            except TooManySolutions:
+                result = self.sample(cells, constraints)
+        else:
+            result = self.sample(cells, constraints)
+
+        if len(self.cache) >= MAX_CACHED:
+            self.cache.clear()
+        self.cache[key] = result + (list(cells),)
+        return result
+
+
+    def backtracker(self, cells, constraints):
+        """
+        :return: (list per cell of constraint ids it is in, mines still needed per
+                  constraint, unassigned cells per constraint)
+        """
+        position = dict((cell, n) for n, cell in enumerate(cells))
+        watching = [[] for cell in cells]
+        need = []
+        left = []
+        for c, (unknown, remaining) in enumerate(constraints):
+            for cell in unknown:
+                watching[position[cell]].append(c)
+            need.append(remaining)
+            left.append(len(unknown))
+        return watching, need, left
+
+
+    def enumerate_solutions(self, cells, constraints):
+        """
+        Backtrack over every assignment of the component's cells
+        """
+        watching, need, left = self.backtracker(cells, constraints)
+        size = len(cells)
+        assignment = [0] * size
+        counts = {}
+        cell_counts = {}
+        found = [0]
+
+        def assign(pos, value):
+            ok = True
+            for c in watching[pos]:
+                need[c] -= value
+                left[c] -= 1
+                if need[c] < 0 or need[c] > left[c]:
+                    ok = False
+            return ok
+
+        def unassign(pos, value):
+            for c in watching[pos]:
+                need[c] += value
+                left[c] += 1
+
+        def backtrack(pos, mines):
+            if pos == size:
+                found[0] += 1
+                if found[0] > MAX_SOLUTIONS:
+                    raise TooManySolutions()
+                counts[mines] = counts.get(mines, 0) + 1
+                per_cell = cell_counts.setdefault(mines, [0] * size)
+                for n in xrange(size):
+                    per_cell[n] += assignment[n]
+                return
+            for value in (0, 1):
+                if assign(pos, value):
+                    assignment[pos] = value
+                    backtrack(pos + 1, mines + value)
+                unassign(pos, value)
+            assignment[pos] = 0
+
+        backtrack(0, 0)
+        return counts, cell_counts
+
+
+    def sample(self, cells, constraints):
+        """
+        Approximate a component by drawing SAMPLES solutions, each found by a
+        backtracking descent that tries the two values of every cell in random
+        order. The draws aren't exactly uniform over solutions, so the result
+        is an estimate. Each descent has a step budget so a hard component
+        can't stall the game.
+        """
+        watching, need, left = self.backtracker(cells, constraints)
+        size = len(cells)
+        counts = {}
+        cell_counts = {}
+        rng = self.rng
+
+        def assign(pos, value, sign):
+            ok = True
+            for c in watching[pos]:
+                need[c] -= value * sign
+                left[c] -= sign
+                if need[c] < 0 or need[c] > left[c]:
+                    ok = False
+            return ok
+
+        for s in xrange(SAMPLES):
+            assignment = [None] * size
+            tried = [0] * size
+            first = [rng.randint(0, 1) for n in xrange(size)]
+            pos = 0
+            steps = 0
+            while 0 <= pos < size and steps < size * 50:
+                steps += 1
+                if assignment[pos] is not None:
+                    # coming back to this cell: take back its value before trying the other
+                    assign(pos, assignment[pos], -1)
+                    assignment[pos] = None
+                if tried[pos] == 2:
+                    # both values failed; backtrack
+                    tried[pos] = 0
+                    pos -= 1
+                    continue
+                value = first[pos] ^ (tried[pos])
+                tried[pos] += 1
+                if assign(pos, value, 1):
+                    assignment[pos] = value
+                    pos += 1
+                else:
+                    assign(pos, value, -1)
+            if pos != size:
+                break
+            mines = sum(assignment)
+            counts[mines] = counts.get(mines, 0) + 1
+            per_cell = cell_counts.setdefault(mines, [0] * size)
+            for n in xrange(size):
+                per_cell[n] += assignment[n]
+            # undo the solution so the constraint counters start clean next time
+            for n in xrange(size):
+                assign(n, assignment[n], -1)
+
+        if not counts:
+            # no solution found within budget; estimate each cell from its densest constraint
+            position = dict((cell, n) for n, cell in enumerate(cells))
+            density = [0.0] * size
+            for unknown, remaining in constraints:
+                for cell in unknown:
+                    n = position[cell]
+                    density[n] = max(density[n], float(remaining) / len(unknown))
+            mines = int(round(sum(density)))
+            counts[mines] = 1
+            cell_counts[mines] = density
+        return counts, cell_counts
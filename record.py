@@ -0,0 +1,274 @@
+"""
+Compact binary log of played games.
+
+A record file is the 5-byte header MAGIC + VERSION followed by any number
+of game records appended one after another. Each record is:
+
+    varint   length of the rest of the record in bytes
+    byte     flags: bit 0 set if a mine bitmap follows instead of a seed,
+             bits 1-2 the result (RUNNING, WON, LOST), bits 3-5 the mode's index in MODES
+    varint   rows, cols, mines
+    varint   length of the strategy name, then the name in ASCII; empty for games played by hand
+    8 bytes  seed, little-endian    -- or --    ceil(rows*cols / 8) bytes of mine bitmap,
+                                                 bit i%8 of byte i//8 set for a mine at index i
+    varint   number of moves
+    moves    per move: varint (zigzag(index - previous index) << 3 | guess << 2 | kind),
+             then varint number of cells the move opened
+
+Indices are delta-encoded against the previous move's index, so a solver
+working its way across the board spends one or two bytes per move; an
+expert game comes to a few hundred bytes. The length prefix lets a reader
+skip a game without decoding it.
+
+RecordWriter appends games to a file as they finish. RecordReader
+memory-maps a file and decodes one game at a time, so files holding
+millions of games can be scanned without loading them.
+"""
+import os
+import mmap
+import struct
+from engine import MODES
+from strategies import Move, REVEAL, FLAG, CHORD
+
+MAGIC = b'MSRC'
+VERSION = 1
+
+# game results
+RUNNING = 0
+WON = 1
+LOST = 2
+
+# move kinds by their 2-bit code
+KINDS = (REVEAL, FLAG, CHORD)
+KIND_CODES = dict((kind, code) for code, kind in enumerate(KINDS))
+
+
+def write_varint(out, n):
+    """
+    Append unsigned int n to bytearray out, 7 bits per byte, low bits first
+    """
+    while n > 0x7f:
+        out.append((n & 0x7f) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def read_varint(data, pos):
+    """
+    :param data: bytearray
+    :param pos: offset of the varint
+    :return: (value, offset just past it)
+    """
+    n = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+
+
+def zigzag(n):
+    # signed to unsigned, keeping small magnitudes small: 0, -1, 1, -2 ... -> 0, 1, 2, 3 ...
+    return n << 1 if n >= 0 else (-n << 1) - 1
+
+
+def unzigzag(n):
+    return n >> 1 if not n & 1 else -((n + 1) >> 1)
+
+
+def mine_bitmap(engine):
+    """
+    :return: bytearray with bit i%8 of byte i//8 set for every mine
+    """
+    bits = bytearray((engine.size + 7) // 8)
+    for row, col in engine.mine_locations:
+        i = engine.index(row, col)
+        bits[i >> 3] |= 1 << (i & 7)
+    return bits
+
+
+def encode_game(engine, moves, store_mines=False, strategy=None):
+    """
+    :param engine: Engine the game was played on, in its final state
+    :param moves: list of (strategies.Move, number of cells it opened)
+    :param store_mines: store the mine bitmap instead of the seed, for boards
+                        that can't be rebuilt from their seed
+    :param strategy: name of the strategy that played the game, or None if it was played by hand
+    :return: bytearray holding the whole record, length prefix included
+    """
+    result = WON if engine.won else LOST if engine.lost else RUNNING
+    body = bytearray()
+    body.append(int(store_mines) | result << 1 | MODES.index(engine.mode) << 3)
+    write_varint(body, engine.rows)
+    write_varint(body, engine.cols)
+    write_varint(body, engine.mines)
+    name = (strategy or '').encode('ascii')
+    write_varint(body, len(name))
+    body.extend(name)
+    if store_mines:
+        body.extend(mine_bitmap(engine))
+    else:
+        body.extend(struct.pack('<Q', engine.seed))
+    write_varint(body, len(moves))
+    previous = 0
+    for move, opened in moves:
+        write_varint(body, zigzag(move.index - previous) << 3 | int(move.guess) << 2 | KIND_CODES[move.kind])
+        write_varint(body, opened)
+        previous = move.index
+
+    record = bytearray()
+    write_varint(record, len(body))
+    record.extend(body)
+    return record
+
+
+class GameRecord(object):
+    """
+    One decoded game. The move list is only decoded when moves is read.
+    strategy is the name of the strategy that played it, or None.
+    """
+    __slots__ = ('rows', 'cols', 'mines', 'mode', 'result', 'strategy', 'seed', 'bitmap', 'data', 'moves_at',
+                 '_moves')
+
+    def __init__(self, data):
+        """
+        :param data: bytearray of the record body, without its length prefix
+        """
+        flags = data[0]
+        self.result = flags >> 1 & 3
+        self.mode = MODES[flags >> 3 & 7]
+        self.rows, pos = read_varint(data, 1)
+        self.cols, pos = read_varint(data, pos)
+        self.mines, pos = read_varint(data, pos)
+        length, pos = read_varint(data, pos)
+        self.strategy = str(data[pos:pos + length]) if length else None
+        pos += length
+        if flags & 1:
+            end = pos + (self.rows * self.cols + 7) // 8
+            self.seed = None
+            self.bitmap = data[pos:end]
+        else:
+            end = pos + 8
+            self.seed = struct.unpack('<Q', bytes(data[pos:end]))[0]
+            self.bitmap = None
+        self.data = data
+        self.moves_at = end
+        self._moves = None
+
+    @property
+    def won(self):
+        return self.result == WON
+
+    @property
+    def lost(self):
+        return self.result == LOST
+
+    @property
+    def moves(self):
+        """
+        :return: list of (strategies.Move, number of cells it opened)
+        """
+        if self._moves is None:
+            data = self.data
+            count, pos = read_varint(data, self.moves_at)
+            moves = []
+            index = 0
+            for k in xrange(count):
+                code, pos = read_varint(data, pos)
+                opened, pos = read_varint(data, pos)
+                index += unzigzag(code >> 3)
+                moves.append((Move(KINDS[code & 3], index, bool(code & 4)), opened))
+            self._moves = moves
+        return self._moves
+
+    def mine_indices(self):
+        """
+        :return: list of flat indices of the mines, from the bitmap; None if the record holds a seed
+        """
+        if self.bitmap is None:
+            return None
+        bitmap = self.bitmap
+        return [i for i in xrange(self.rows * self.cols) if bitmap[i >> 3] >> (i & 7) & 1]
+
+
+class RecordWriter(object):
+    """
+    Appends game records to a file, writing the header if the file is new
+    """
+    def __init__(self, path, store_mines=False):
+        self.store_mines = store_mines
+        self.file = open(path, 'ab+')
+        self.file.seek(0, os.SEEK_END)
+        if self.file.tell() == 0:
+            self.file.write(MAGIC + bytearray([VERSION]))
+        else:
+            self.file.seek(0)
+            header = bytearray(self.file.read(len(MAGIC) + 1))
+            if header[:len(MAGIC)] != MAGIC or header[len(MAGIC):] != bytearray([VERSION]):
+                self.file.close()
+                raise ValueError("%s is not a version %d game record file; can't append to it" % (path, VERSION))
+            self.file.seek(0, os.SEEK_END)
+
+    def write(self, engine, moves, strategy=None):
+        """
+        Append one finished game; see encode_game
+        """
+        self.file.write(encode_game(engine, moves, self.store_mines, strategy))
+
+    def write_encoded(self, records):
+        """
+        Append records already encoded with encode_game, e.g. by worker processes
+        """
+        for record in records:
+            self.file.write(record)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RecordReader(object):
+    """
+    Iterates the games in a record file through a read-only memory map
+    """
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        if os.fstat(self.file.fileno()).st_size == 0:
+            raise ValueError("%s is empty, not a game record file" % path)
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            raise ValueError("%s is not a game record file" % path)
+        if ord(self.map[len(MAGIC)]) != VERSION:
+            raise ValueError("%s has record version %d, expected %d" % (path, ord(self.map[len(MAGIC)]), VERSION))
+
+    def __iter__(self):
+        """
+        :return: iterator of GameRecord, read in file order
+        """
+        data = self.map
+        pos = len(MAGIC) + 1
+        end = len(data)
+        while pos < end:
+            # the length prefix is at most 10 bytes; decode it from a small slice
+            length, skip = read_varint(bytearray(data[pos:pos + 10]), 0)
+            pos += skip
+            yield GameRecord(bytearray(data[pos:pos + length]))
+            pos += length
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,242 @@
+"""
+Rebuild recorded games move by move.
+
+A Replay resets an engine to a record's starting board (from its seed or
+mine bitmap) and applies the recorded moves. Every SNAPSHOT_INTERVAL moves
+it keeps a snapshot of the engine, so seeking to any move restores the
+nearest earlier snapshot and replays at most SNAPSHOT_INTERVAL - 1 moves,
+instead of the whole game.
+
+    python replay.py games.rec 17             # print game 17 after its last move
+    python replay.py games.rec 17 --move 40   # ... after move 40
+    python replay.py games.rec 17 --gui       # step through it in the game window
+
+In the window, right and left arrows step forward and back, page up and
+down jump SNAPSHOT_INTERVAL moves, home and end go to the start and end,
+and space plays or pauses.
+"""
+import argparse
+from engine import Engine
+from record import RecordReader
+from strategies import apply_move
+
+# moves between engine snapshots; seeking replays at most this many moves minus one
+SNAPSHOT_INTERVAL = 32
+
+
+def load_game(path, number):
+    """
+    :param path: game record file
+    :param number: int, position of the game in the file, from 0
+    :return: record.GameRecord
+    """
+    count = 0
+    with RecordReader(path) as reader:
+        for game in reader:
+            if count == number:
+                # the record's bytes are copied out of the map, so it outlives the reader
+                return game
+            count += 1
+    raise IndexError("%s holds only %d games" % (path, count))
+
+
+class Replay(object):
+    """
+    Steps an engine through a recorded game, forward or back
+    """
+    def __init__(self, game, engine=None, interval=SNAPSHOT_INTERVAL):
+        """
+        :param game: record.GameRecord
+        :param engine: Engine of the game's size to replay on, e.g. a Board's; a new one when None
+        :param interval: moves between snapshots
+        """
+        if engine is None:
+            engine = Engine(game.rows, game.cols, game.mines, seed=0, mode=game.mode)
+        if (engine.rows, engine.cols, engine.mines) != (game.rows, game.cols, game.mines):
+            raise ValueError("engine is %dx%d with %d mines, the game is %dx%d with %d" % (
+                engine.rows, engine.cols, engine.mines, game.rows, game.cols, game.mines))
+        self.game = game
+        self.engine = engine
+        self.interval = interval
+        self.moves = game.moves
+
+        if game.seed is not None:
+            engine.reset(game.seed)
+        else:
+            engine.reset(0)
+            engine.clear_mines()
+            engine.set_mines(game.mine_indices())
+        self.position = 0  # number of moves applied
+        self.snapshots = [engine.snapshot()]  # snapshots[k] is the state after k * interval moves
+
+
+    def __len__(self):
+        return len(self.moves)
+
+
+    def step(self):
+        """
+        Apply the next move
+        :return: list of flat indices it revealed
+        """
+        move, expected = self.moves[self.position]
+        opened = apply_move(self.engine, move)
+        if len(opened) != expected:
+            raise ValueError("move %d (%s %d) opened %d cells, the record says %d; "
+                             "the board doesn't match the one recorded" % (
+                                 self.position, move.kind, move.index, len(opened), expected))
+        self.position += 1
+        if self.position % self.interval == 0 and self.position // self.interval == len(self.snapshots):
+            self.snapshots.append(self.engine.snapshot())
+        return opened
+
+
+    def seek(self, position):
+        """
+        Put the engine in the state after the given number of moves
+        :param position: int, 0 for the starting board up to len(self) for the end of the game
+        """
+        position = max(0, min(position, len(self.moves)))
+        if position < self.position or position - self.position >= self.interval:
+            # start from the closest snapshot at or before position, if it beats stepping from here
+            k = min(position // self.interval, len(self.snapshots) - 1)
+            if k * self.interval > self.position or position < self.position:
+                self.engine.restore(self.snapshots[k])
+                self.position = k * self.interval
+        while self.position < position:
+            self.step()
+
+
+def render_text(engine):
+    """
+    :return: str drawing of the board as the player sees it: # hidden, F flag,
+             * mine, X the mine that was clicked, . empty, digits for counts
+    """
+    lines = []
+    for row in xrange(engine.rows):
+        line = []
+        for i in xrange(row * engine.cols, (row + 1) * engine.cols):
+            if not engine.revealed[i]:
+                line.append('F' if engine.flagged[i] else '#')
+            elif engine.is_mine[i]:
+                line.append('X' if i == engine.detonated else '*')
+            else:
+                line.append(str(engine.neighbors[i]) if engine.neighbors[i] else '.')
+        lines.append(''.join(line))
+    return '\n'.join(lines)
+
+
+class Viewer(object):
+    """
+    Shows a Replay in the game window. It stands in for the Minesweeper app
+    as the Gui's game, with the timer showing the current move number.
+    """
+    def __init__(self, game, moves_per_second=4):
+        import pygame
+        import colors
+        from board import Board, window_size, display_cell_size
+        from gui import Gui
+
+        pygame.init()
+        cell_size = display_cell_size(game.rows, game.cols)
+        self.screen = pygame.display.set_mode(window_size(game.rows, game.cols, cell_size))
+        self.screen.fill(colors.bg_gray)
+        pygame.display.flip()
+        pygame.display.set_caption("Replay")
+
+        self.board = Board(game.rows, game.cols, game.mines, self.screen, mode=game.mode, cell_size=cell_size)
+        self.replay = Replay(game, self.board.engine)
+        self.gui = Gui(self.board, self)
+        self.moves_per_second = moves_per_second
+        self.playing = False
+
+    @property
+    def score(self):
+        return self.replay.engine.score
+
+    @property
+    def time_elapsed(self):
+        return self.replay.position
+
+    @property
+    def lost_game(self):
+        return self.replay.engine.lost
+
+    @property
+    def won_game(self):
+        return self.replay.engine.won
+
+
+    def draw(self):
+        import pygame
+        rects = self.board.draw()
+        header_rect = self.gui.draw()
+        if header_rect is not None:
+            rects.append(header_rect)
+        if rects:
+            pygame.display.update(rects)
+
+
+    def loop(self):
+        import pygame
+        from pygame.locals import QUIT, KEYDOWN, K_ESCAPE, K_RIGHT, K_LEFT, K_HOME, K_END, \
+            K_PAGEUP, K_PAGEDOWN, K_SPACE
+
+        replay = self.replay
+        clock = pygame.time.Clock()
+        running = True
+        self.draw()
+        while running:
+            events = pygame.event.get() if self.playing else [pygame.event.wait()] + pygame.event.get()
+            for event in events:
+                if event.type == QUIT or (event.type == KEYDOWN and event.key == K_ESCAPE):
+                    running = False
+                elif event.type == KEYDOWN:
+                    jumps = {K_RIGHT: replay.position + 1, K_LEFT: replay.position - 1,
+                             K_PAGEDOWN: replay.position + replay.interval,
+                             K_PAGEUP: replay.position - replay.interval,
+                             K_HOME: 0, K_END: len(replay)}
+                    if event.key in jumps:
+                        self.playing = False
+                        replay.seek(jumps[event.key])
+                    elif event.key == K_SPACE:
+                        self.playing = not self.playing
+            if self.playing:
+                if replay.position < len(replay):
+                    replay.step()
+                else:
+                    self.playing = False
+            self.draw()
+            if self.playing:
+                clock.tick(self.moves_per_second)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a game from a record file")
+    parser.add_argument("path", help="game record file written by batch.py --record")
+    parser.add_argument("game", type=int, nargs="?", default=0, help="number of the game in the file, from 0")
+    parser.add_argument("--move", type=int, help="show the board after this many moves (default: all)")
+    parser.add_argument("--gui", action="store_true", help="step through the game in the game window")
+    parser.add_argument("--speed", type=float, default=4, help="moves per second when playing in the window")
+    args = parser.parse_args()
+
+    game = load_game(args.path, args.game)
+    if args.gui:
+        viewer = Viewer(game, args.speed)
+        viewer.replay.seek(len(viewer.replay) if args.move is None else args.move)
+        viewer.loop()
+    else:
+        replay = Replay(game)
+        replay.seek(len(replay) if args.move is None else args.move)
+        engine = replay.engine
+        print "game %d: %dx%d, %d mines, %s mode, %s, played by %s" % (
+            args.game, game.rows, game.cols, game.mines, game.mode,
+            "seed %d" % game.seed if game.seed is not None else "recorded layout",
+            game.strategy or "hand")
+        print "move %d of %d, %s" % (replay.position, len(replay),
+                                     "lost" if engine.lost else "won" if engine.won else "in play")
+        if replay.position:
+            move, opened = game.moves[replay.position - 1]
+            print "last move: %s %d,%d%s, opened %d" % (move.kind, move.index // game.cols, move.index % game.cols,
+                                                       " (guess)" if move.guess else "", opened)
+        print render_text(engine)
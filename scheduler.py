@@ -0,0 +1,101 @@
+"""
+Cooperative task scheduler for the game window.
+
+The window runs several jobs at their own pace on one thread: polling
+input, drawing frames and stepping the solver. Each is a task, a generator
+that does a little work and then yields the number of seconds until it
+wants to run again, the way an asyncio coroutine awaits asyncio.sleep():
+
+    def render():
+        while True:
+            draw()
+            yield 1.0 / fps
+
+The scheduler always resumes the task that is due first and sleeps while
+none is due, so a task that yields often never starves the others, and a
+task can be cancelled between any two of its steps.
+"""
+import heapq
+import time
+
+
+class Scheduler(object):
+    """
+    Runs generator tasks by name until all have finished or stop() is called
+    """
+    def __init__(self, clock=time.time, sleep=time.sleep):
+        """
+        :param clock: function returning the time in seconds
+        :param sleep: function(seconds) that waits
+        """
+        self.clock = clock
+        self.sleep = sleep
+        self.queue = []  # heap of (due time, spawn order, name, task)
+        self.tasks = {}  # name -> task generator, for the tasks not finished or cancelled
+        self.spawned = 0
+        self.running = False
+
+
+    def spawn(self, name, task, delay=0):
+        """
+        Start a task, cancelling any task already running under the same name
+        :param name: str, name to cancel or look up the task by
+        :param task: generator yielding seconds to wait between its steps
+        :param delay: seconds before its first step
+        """
+        self.cancel(name)
+        self.tasks[name] = task
+        self.spawned += 1
+        heapq.heappush(self.queue, (self.clock() + delay, self.spawned, name, task))
+
+
+    def cancel(self, name):
+        """
+        Stop a task between steps; it sees GeneratorExit at its yield, so its finally blocks run
+        :return: True if a task was running under that name
+        """
+        task = self.tasks.pop(name, None)
+        if task is None:
+            return False
+        # its queue entry is skipped when it comes up
+        task.close()
+        return True
+
+
+    def __contains__(self, name):
+        return name in self.tasks
+
+
+    def stop(self):
+        """
+        Make run() return after the current step, cancelling every task
+        """
+        self.running = False
+
+
+    def run(self):
+        """
+        Step tasks in order of when they're due until none are left or stop() is called
+        """
+        self.running = True
+        queue = self.queue
+        while self.running and queue:
+            due, order, name, task = heapq.heappop(queue)
+            if self.tasks.get(name) is not task:
+                continue
+            now = self.clock()
+            if due > now:
+                self.sleep(due - now)
+            try:
+                delay = next(task)
+            except StopIteration:
+                if self.tasks.get(name) is task:
+                    del self.tasks[name]
+                continue
+            if self.tasks.get(name) is task:
+                # keep a steady pace, but don't rush to catch up after a slow step
+                heapq.heappush(queue, (max(due + delay, self.clock()), order, name, task))
+        for name in self.tasks.keys():
+            self.cancel(name)
+        del queue[:]
+        self.running = False
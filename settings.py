@@ -0,0 +1,76 @@
+"""
+Board sizes: the presets in settings.yaml, or custom sizes given as ROWSxCOLSxMINES.
+
+settings.yaml is found next to this module, whatever the working directory,
+and is read at most once per process: on the first lookup of a preset name.
+Custom sizes never read it, so yaml isn't even imported for them.
+"""
+import os
+import re
+
+CUSTOM_SIZE = re.compile(r'^(\d+)x(\d+)x(\d+)$')
+
+# settings.yaml, resolved once per process
+settings_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'settings.yaml')
+
+presets = None  # preset name -> (rows, cols, mines), once loaded
+
+
+def check_size(rows, cols, mines):
+    """
+    :raises ValueError: if the board has no cells or no safe cell
+    """
+    if rows < 1 or cols < 1:
+        raise ValueError("a board needs at least one row and one column, not %dx%d" % (rows, cols))
+    if mines >= rows * cols:
+        raise ValueError("%d mines leave no safe cell on a %dx%d board" % (mines, rows, cols))
+
+
+def load():
+    """
+    Parse and check settings.yaml on the first call; later calls return the same dict
+    :return: dict of preset name -> (rows, cols, mines)
+    :raises ValueError: if a preset lacks integer rows, columns and mines, or has no safe cell
+    """
+    global presets
+    if presets is None:
+        import yaml
+        with open(settings_path, 'r') as f:
+            data = yaml.safe_load(f) or {}
+        if not isinstance(data, dict):
+            raise ValueError("%s should map preset names to board sizes" % settings_path)
+        loaded = {}
+        for name, preset in data.items():
+            try:
+                size = tuple(preset[key] for key in ("rows", "columns", "mines"))
+            except (TypeError, KeyError):
+                raise ValueError("preset %r in %s needs rows, columns and mines" % (name, settings_path))
+            if not all(type(n) in (int, long) and n >= 0 for n in size):
+                raise ValueError("preset %r in %s has a size that isn't whole numbers: %r" % (
+                    name, settings_path, preset))
+            try:
+                check_size(*size)
+            except ValueError as e:
+                raise ValueError("preset %r in %s: %s" % (name, settings_path, e))
+            loaded[str(name)] = size
+        presets = loaded
+    return presets
+
+
+def board_size(difficulty):
+    """
+    :param difficulty: name of a preset in settings.yaml, e.g. "expert", or a
+                       custom size as ROWSxCOLSxMINES, e.g. "1000x1000x150000"
+    :return: (rows, cols, mines)
+    :raises ValueError: if difficulty is neither, or leaves no safe cell
+    """
+    match = CUSTOM_SIZE.match(difficulty)
+    if match:
+        rows, cols, mines = [int(n) for n in match.groups()]
+        check_size(rows, cols, mines)
+        return rows, cols, mines
+    sizes = load()
+    if difficulty not in sizes:
+        raise ValueError("unknown difficulty %r, expected one of %s or ROWSxCOLSxMINES" % (
+            difficulty, ", ".join(sorted(sizes))))
+    return sizes[difficulty]
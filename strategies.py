@@ -0,0 +1,277 @@
+"""
+Solver strategies and the driver that plays them.
+
+A strategy never touches the engine. It gets an Observation, a read-only
+view of what a player can see, and its moves() generator yields Moves.
+The driver applies each move to the engine and sends back the list of cells
+it revealed, so a strategy can update its knowledge incrementally:
+
+    opened = yield Move(REVEAL, i)
+
+Strategies are registered by name in STRATEGIES so they can be picked from
+the command line and benchmarked side by side.
+"""
+import random
+from collections import namedtuple
+from deduction import Deducer, UNKNOWN, MINE, REVEALED
+from probability import Guesser
+from engine import derive_seed
+import instrument
+
+# move kinds
+REVEAL = 'reveal'
+FLAG = 'flag'
+CHORD = 'chord'  # reveal every unflagged neighbor of a revealed number with all its mines flagged
+
+# guess is True when the strategy couldn't prove the move safe
+Move = namedtuple('Move', 'kind index guess')
+Move.__new__.__defaults__ = (False,)
+
+
+class Observation(object):
+    """
+    Read-only view of the visible state of an engine's board. The engine
+    is private: strategies only see what a player sees, so they can't read
+    where the mines are.
+    """
+    __slots__ = ('_engine',)
+
+    def __init__(self, engine):
+        self._engine = engine
+
+    @property
+    def rows(self):
+        return self._engine.rows
+
+    @property
+    def cols(self):
+        return self._engine.cols
+
+    @property
+    def mines(self):
+        return self._engine.mines
+
+    @property
+    def size(self):
+        return self._engine.size
+
+    @property
+    def finished(self):
+        return self._engine.finished
+
+    def revealed(self, i):
+        return bool(self._engine.revealed[i])
+
+    def flagged(self, i):
+        return bool(self._engine.flagged[i])
+
+    def number(self, i):
+        """
+        :return: neighboring mine count shown by cell i, or None if it isn't revealed
+        """
+        if self._engine.revealed[i]:
+            return self._engine.neighbors[i]
+        return None
+
+    def neighbors(self, i):
+        return self._engine.get_neighbors(i)
+
+    def revealed_cells(self):
+        """
+        :return: list of flat indices of the revealed cells, e.g. to pick up a game already under way
+        """
+        return [i for i, revealed in enumerate(self._engine.revealed) if revealed]
+
+    @property
+    def revealed_count(self):
+        """
+        :return: number of revealed cells, from the engine's counters rather than a scan
+        """
+        engine = self._engine
+        return engine.size - engine.mines - engine.hidden_safe
+
+    @property
+    def neighbor_table(self):
+        """
+        :return: (offsets, adjacency) neighbor table of the board; see engine.neighbor_table
+        """
+        return self._engine.offsets, self._engine.adjacency
+
+
+def apply_move(engine, move):
+    """
+    Apply one move to the engine
+    :return: list of flat indices revealed by the move
+    """
+    if move.kind == REVEAL:
+        return engine.reveal(move.index)
+    if move.kind == FLAG:
+        engine.toggle_flag(move.index)
+        return []
+    if move.kind == CHORD:
+        return engine.chord(move.index)
+    raise ValueError("unknown move kind %r" % (move.kind,))
+
+
+def steps(engine, strategy, rng=None):
+    """
+    Play one game on the engine with a strategy, one move per step, until it's
+    won, lost or the strategy gives up. Nothing happens between steps, so the
+    caller decides when the next move is made, or stops making them.
+    :param engine: Engine, freshly reset or with a game under way
+    :param strategy: strategy instance
+    :param rng: random.Random for the strategy; derived from the game seed when None,
+                never equal to it, or its choices would replay the draws that placed the mines
+    :return: generator yielding (move, list of flat indices it revealed) after each move is applied
+    """
+    if rng is None:
+        rng = random.Random(derive_seed(engine.seed, 1))
+    moves = strategy.moves(Observation(engine), rng)
+    try:
+        move = next(moves)
+        while True:
+            stats = instrument.active
+            if stats is None:
+                opened = apply_move(engine, move)
+            else:
+                start = instrument.clock()
+                opened = apply_move(engine, move)
+                stats.move(move, opened, instrument.clock() - start)
+            yield move, opened
+            if engine.finished:
+                break
+            move = moves.send(opened)
+    except StopIteration:
+        pass
+    finally:
+        moves.close()
+
+
+def play(engine, strategy, rng=None, on_move=None):
+    """
+    Play one game on the engine with a strategy until it's won, lost or the strategy gives up
+    :param engine: Engine, freshly reset
+    :param strategy: strategy instance
+    :param rng: random.Random for the strategy; see steps
+    :param on_move: optional function(move, opened) called after each move is applied
+    :return: (number of moves made, number of those that were guesses)
+    """
+    count = guesses = 0
+    for move, opened in steps(engine, strategy, rng):
+        count += 1
+        guesses += move.guess
+        if on_move is not None:
+            on_move(move, opened)
+    return count, guesses
+
+
+class LogicStrategy(object):
+    """
+    Flags and reveals whatever the Deducer can prove, feeding it the numbers
+    each move uncovers. Safe cells next to a number whose mines are all
+    flagged are opened together with a chord. When nothing can be proven it
+    asks guess() for a cell. On a game already under way it starts from the
+    cells already revealed; flags it didn't place are only trusted once it
+    has proven them, and removed if it proves the cell safe. Cells someone
+    else opens mid-game, e.g. by hand during auto-play, are learned before
+    the next decision, and flags taken off proven mines are put back.
+    """
+    name = 'logic'
+
+    def moves(self, observation, rng):
+        deducer = Deducer(observation.neighbor_table, observation.mines)
+
+        def learn(opened):
+            # in index order, so deductions don't depend on the order a backend's flood opened cells
+            for n in sorted(opened):
+                deducer.reveal(n, observation.number(n))
+
+        revealed = observation.revealed_cells()
+        if revealed:
+            learn(revealed)
+        else:
+            # the opening click isn't counted as a guess
+            learn((yield Move(REVEAL, 0)))
+        while not observation.finished:
+            if len(deducer.numbers) != observation.revealed_count:
+                # opened behind our back; learning them also keeps guess() off revealed cells
+                learn([i for i in observation.revealed_cells() if i not in deducer.numbers])
+            safe, mines = deducer.run()
+            for i in mines:
+                if not observation.flagged(i):
+                    yield Move(FLAG, i)
+            for i in safe:
+                if not observation.revealed(i):
+                    if observation.flagged(i):
+                        yield Move(FLAG, i)
+                    chord = self.chord_for(observation, deducer, i)
+                    if chord is None:
+                        learn((yield Move(REVEAL, i)))
+                    else:
+                        learn((yield Move(CHORD, chord)))
+            if not safe and not mines:
+                unflagged = [i for i in xrange(deducer.size)
+                             if deducer.state[i] == MINE and not observation.flagged(i)]
+                if unflagged:
+                    # taken off by hand; put them back so the game can be won
+                    for i in unflagged:
+                        if not observation.flagged(i):
+                            yield Move(FLAG, i)
+                    continue
+                if deducer.unknown == 0:
+                    return
+                learn((yield Move(REVEAL, self.guess(deducer, rng), True)))
+
+
+    def chord_for(self, observation, deducer, i):
+        """
+        Chording on a number whose flags are all on proven mines, as many as
+        it shows, only opens safe cells. Candidates are found from what the
+        deducer knows, and only their flags are read from the board.
+        :param i: flat index of a hidden cell known to be safe
+        :return: a revealed neighbor of i whose mines are all flagged and which has
+                 other hidden cells to open along with i, or None
+        """
+        state = deducer.state
+        for n in deducer.neighbors(i):
+            if state[n] != REVEALED or not deducer.numbers[n]:
+                continue
+            mines = hidden = 0
+            around = deducer.neighbors(n)
+            for m in around:
+                if state[m] == MINE:
+                    mines += 1
+                elif state[m] != REVEALED:
+                    hidden += 1
+            if mines == deducer.numbers[n] and hidden > 1:
+                # the flags must be exactly the proven mines, or the chord won't do what's expected
+                if all(observation.flagged(m) == (state[m] == MINE) for m in around if state[m] != REVEALED):
+                    return n
+        return None
+
+
+    @instrument.timed('solver.guess')
+    def guess(self, deducer, rng):
+        """
+        :return: a random cell the deducer knows nothing about
+        """
+        return rng.choice([i for i in xrange(deducer.size) if deducer.state[i] == UNKNOWN])
+
+
+class ProbabilityStrategy(LogicStrategy):
+    """
+    LogicStrategy that guesses the cell least likely to be a mine
+    """
+    name = 'probability'
+
+    def __init__(self):
+        self.guesser = Guesser()
+
+    @instrument.timed('solver.guess')
+    def guess(self, deducer, rng):
+        self.guesser.rng = rng
+        i, chance = self.guesser.safest(deducer)
+        return i
+
+
+STRATEGIES = dict((strategy.name, strategy) for strategy in (LogicStrategy, ProbabilityStrategy))
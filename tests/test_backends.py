@@ -0,0 +1,92 @@
+"""
+Both engine backends must play every game the same way: the bitboard
+engine's shifted-mask counts and floods against the array engine's loops.
+
+    python -m unittest discover tests
+"""
+import random
+import unittest
+from engine import Engine, MODES, derive_seed
+from bitboard import BitboardEngine
+from strategies import STRATEGIES, play
+
+
+def layers(engine):
+    return (bytearray(engine.is_mine), bytearray(engine.revealed), bytearray(engine.flagged),
+            bytearray(engine.neighbors))
+
+
+def counters(engine):
+    return (engine.score, engine.won, engine.lost, engine.detonated, engine.hidden_safe,
+            engine.correct_flags, engine.wrong_flags)
+
+
+class BackendTest(unittest.TestCase):
+
+    def assertSameState(self, a, b, message=None):
+        self.assertEqual(layers(a), layers(b), message)
+        self.assertEqual(counters(a), counters(b), message)
+        self.assertEqual(sorted(a.mine_locations), sorted(b.mine_locations), message)
+
+
+    def test_random_moves(self):
+        rng = random.Random(1)
+        for trial in xrange(200):
+            rows, cols = rng.randint(1, 20), rng.randint(1, 25)
+            mines = rng.randint(0, rows * cols - 1)
+            mode = rng.choice(MODES[:3])
+            seed = rng.getrandbits(64)
+            a = Engine(rows, cols, mines, seed=seed, mode=mode)
+            b = BitboardEngine(rows, cols, mines, seed=seed, mode=mode)
+            for step in xrange(40):
+                i = rng.randrange(rows * cols)
+                kind = rng.random()
+                if kind < 0.3:
+                    a.toggle_flag(i)
+                    b.toggle_flag(i)
+                elif kind < 0.5:
+                    self.assertEqual(sorted(a.chord(i)), sorted(b.chord(i)))
+                else:
+                    self.assertEqual(sorted(a.reveal(i)), sorted(b.reveal(i)))
+                message = "trial %d step %d" % (trial, step)
+                self.assertSameState(a, b, message)
+                self.assertEqual(a.frontier(), b.frontier(), message)
+                if a.finished:
+                    break
+
+
+    def test_move_mine_matches_recount(self):
+        rng = random.Random(2)
+        for backend in (Engine, BitboardEngine):
+            for trial in xrange(50):
+                rows, cols = rng.randint(1, 12), rng.randint(2, 12)
+                mines = rng.randint(1, rows * cols - 1)
+                engine = backend(rows, cols, mines, seed=rng.getrandbits(64))
+                for step in xrange(20):
+                    src = rng.choice([i for i in xrange(engine.size) if engine.is_mine[i]])
+                    dst = rng.choice([i for i in xrange(engine.size) if not engine.is_mine[i]])
+                    engine.move_mine(src, dst)
+                counted = backend(rows, cols, mines, seed=0)
+                counted.clear_mines()
+                counted.set_mines([engine.index(row, col) for row, col in engine.mine_locations])
+                self.assertEqual(engine.neighbors, counted.neighbors)
+                if backend is BitboardEngine:
+                    self.assertEqual(engine.zero_mask, counted.zero_mask)
+
+
+    def test_same_games(self):
+        for mode in MODES:
+            for name in sorted(STRATEGIES):
+                a = Engine(9, 12, 18, seed=0, mode=mode)
+                b = BitboardEngine(9, 12, 18, seed=0, mode=mode)
+                for k in xrange(25):
+                    seed = derive_seed(5, k)
+                    a.reset(seed)
+                    b.reset(seed)
+                    message = "%s %s game %d" % (mode, name, k)
+                    self.assertEqual(play(a, STRATEGIES[name]()), play(b, STRATEGIES[name]()), message)
+                    self.assertSameState(a, b, message)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+"""
+Board generation modes: no_guess layouts are repaired by moving mines, so
+anything kept about the board before the first click has to follow them.
+
+    python -m unittest discover tests
+"""
+import random
+import unittest
+from engine import Engine, MODES, check_mode, derive_seed
+from bitboard import BitboardEngine
+from strategies import STRATEGIES, play
+
+
+class GenerationTest(unittest.TestCase):
+
+    def test_flags_before_first_click(self):
+        rng = random.Random(4)
+        for backend in (Engine, BitboardEngine):
+            for trial in xrange(30):
+                engine = backend(16, 30, 99, seed=rng.getrandbits(64), mode='no_guess')
+                for i in rng.sample(xrange(1, engine.size), engine.size * 3 // 10):
+                    engine.toggle_flag(i)
+                engine.reveal(0)
+                flagged = [i for i in xrange(engine.size) if engine.flagged[i]]
+                correct = sum(1 for i in flagged if engine.is_mine[i])
+                message = "%s trial %d" % (backend.name, trial)
+                self.assertEqual((engine.correct_flags, engine.wrong_flags),
+                                 (correct, len(flagged) - correct), message)
+
+
+    def test_no_guess_needs_no_guesses(self):
+        for rows, cols, mines in ((9, 9, 10), (16, 16, 40), (16, 30, 99), (8, 8, 30)):
+            engine = Engine(rows, cols, mines, seed=0, mode='no_guess')
+            for k in xrange(20):
+                engine.reset(derive_seed(6, k))
+                moves, guesses = play(engine, STRATEGIES['logic']())
+                message = "%dx%dx%d game %d" % (rows, cols, mines, k)
+                self.assertEqual(guesses, 0, message)
+                self.assertTrue(engine.won, message)
+
+
+    def test_check_mode(self):
+        for mode in MODES:
+            check_mode(16, 30, 99, mode)
+        self.assertRaises(ValueError, check_mode, 16, 30, 300, 'no_guess')
+        self.assertRaises(ValueError, check_mode, 9, 9, 10, 'no_such_mode')
+        engine = Engine(16, 30, 300, seed=0, mode='no_guess')
+        self.assertRaises(ValueError, engine.reveal, 255)
+        self.assertFalse(engine.placed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+"""
+Games written to a record file must read back and replay to the same
+final board, in every mode and with either the seed or the mine bitmap stored.
+
+    python -m unittest discover tests
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from engine import Engine, MODES, derive_seed
+from record import RecordWriter, RecordReader, write_varint, read_varint, zigzag, unzigzag
+from replay import Replay
+from strategies import STRATEGIES, play
+
+
+class RecordTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'games.rec')
+
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+
+    def test_varint_and_zigzag(self):
+        for n in (0, 1, 127, 128, 300, 16383, 16384, 2 ** 32, 2 ** 64 - 1):
+            data = bytearray()
+            write_varint(data, n)
+            self.assertEqual(read_varint(data, 0), (n, len(data)))
+        for n in (0, -1, 1, -2, 2, -1000, 1000, -2 ** 40):
+            self.assertEqual(unzigzag(zigzag(n)), n)
+            self.assertTrue(zigzag(n) >= 0)
+
+
+    def test_round_trip(self):
+        played = []  # (engine state, moves) in the order written
+        for store_mines in (False, True):
+            path = self.path + str(int(store_mines))
+            with RecordWriter(path, store_mines) as writer:
+                for mode in MODES:
+                    for name in sorted(STRATEGIES):
+                        for k in xrange(6):
+                            engine = Engine(9, 12, 20, seed=derive_seed(3, k), mode=mode)
+                            moves = []
+                            play(engine, STRATEGIES[name](), on_move=lambda move, opened: moves.append((move, len(opened))))
+                            writer.write(engine, moves, name)
+                            played.append((engine, moves, name))
+
+        games = []
+        for store_mines in (False, True):
+            with RecordReader(self.path + str(int(store_mines))) as reader:
+                games.extend(reader)
+        self.assertEqual(len(games), len(played))
+
+        for game, (engine, moves, name) in zip(games, played):
+            self.assertEqual((game.rows, game.cols, game.mines, game.mode, game.strategy),
+                             (engine.rows, engine.cols, engine.mines, engine.mode, name))
+            self.assertEqual((game.won, game.lost), (engine.won, engine.lost))
+            self.assertEqual(game.moves, moves)
+            if game.seed is None:
+                self.assertEqual(game.mine_indices(), sorted(engine.index(row, col)
+                                                             for row, col in engine.mine_locations))
+            else:
+                self.assertEqual(game.seed, engine.seed)
+
+            replay = Replay(game)
+            replay.seek(len(replay))
+            replayed = replay.engine
+            self.assertEqual(bytearray(replayed.is_mine), bytearray(engine.is_mine))
+            self.assertEqual(bytearray(replayed.revealed), bytearray(engine.revealed))
+            self.assertEqual(bytearray(replayed.flagged), bytearray(engine.flagged))
+            self.assertEqual((replayed.score, replayed.won, replayed.lost), (engine.score, engine.won, engine.lost))
+
+
+if __name__ == "__main__":
+    unittest.main()
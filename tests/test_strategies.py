@@ -0,0 +1,36 @@
+"""
+Strategies must finish every game, even when someone else moves on the
+board between their moves, as a player can by hand during auto-play.
+
+    python -m unittest discover tests
+"""
+import random
+import unittest
+from engine import Engine, derive_seed
+from strategies import STRATEGIES, steps
+
+
+class StrategyTest(unittest.TestCase):
+
+    def test_moves_made_by_hand(self):
+        rng = random.Random(3)
+        for name in sorted(STRATEGIES):
+            for k in xrange(60):
+                engine = Engine(16, 30, 99, seed=derive_seed(8, k), mode='opening')
+                count = 0
+                for move, opened in steps(engine, STRATEGIES[name]()):
+                    count += 1
+                    self.assertTrue(count < 4 * engine.size, "%s game %d never ends" % (name, k))
+                    if count % 5 == 0 and not engine.finished:
+                        hidden = [i for i in xrange(engine.size) if not engine.revealed[i]]
+                        i = rng.choice(hidden)
+                        if engine.is_mine[i]:
+                            if engine.flagged[i]:
+                                engine.toggle_flag(i)
+                        else:
+                            engine.reveal(i)
+                self.assertTrue(engine.finished, "%s game %d given up" % (name, k))
+
+
+if __name__ == "__main__":
+    unittest.main()